@@ -4,13 +4,15 @@
 # <div class="alert alert-success">
 # Este notebook de ipython depende de los modulos:  
 # <li> `tecnicas_numericas`, ilustrado en el notebook [Técnicas numéricas](tecnicas_numericas.ipynb).  
-# <li> `vis_int`, ilustrado en el notebook [Visualización e Interacción](vis_int.ipybn) (esta incluido en el `import` a `tecnicas_numericas`).  
+# <li> `vis_int`, ilustrado en el notebook [Visualización e Interacción](vis_int.ipybn).  
 # </div>
 
 # In[1]:
 
+from vis_int import *
 from tecnicas_numericas import *
 from time import time
+from concurrent.futures import ThreadPoolExecutor
 #import tecnicas_numericas
 #print(dir(tecnicas_numericas))
 
@@ -23,6 +25,88 @@ from time import time
 
 # La aplicación del método del disparo con el algoritmo de Numerov, implica la búsqueda de raíces para encontrar los autovalores de energía. Su forma de proceder es mediante el avance regular en pasos de energía entre un mínimo y máximo hasta encontrar un cambio de signo en la evaluación la función de onda (o criterio equivalente, como la derivada logaritmica de la misma) hasta el punto de comparación. La presencia de este cambio de signo indica que existe una energía $E$ en el intervalo $[E_i, E_{i+1}]$ que es o raíz de la función de Numerov (por tanto autovalor del sistema) o una discontinuidad. Estas raíces y discontinuidas son asociadas a la función equivalente de cuantización de la energía, como en el problema típico de potencial finito lo es la ecuación trascendental (sin embargo, esta no aparace explicitamente en el modelo numerico).
 
+# ### Simulación en segundo plano
+# 
+# Con los botones de simulación el cálculo se ejecuta en un hilo aparte (`SolucionFondo`), de manera que el kernel sigue atendiendo los controles mientras se busca el autovalor. La barra de progreso avanza con la energía evaluada en la búsqueda, y el botón _Cancelar_ detiene la solución en curso. Cada solución lleva un número de versión: al pedir una nueva (con el botón, o al mover un deslizador mientras hay una en curso) la anterior queda obsoleta, se detiene en su siguiente reporte de avance y sus resultados no se muestran, en lugar de quedar en cola por delante de la nueva. Los resultados se muestran en un control `Output`, que se puede actualizar desde el hilo de la solución, sobre una misma `VistaSolucion` por control. Cada control guarda además su `Continuacion`: al mover un deslizador en un paso, el nuevo autovalor se busca solo cerca de la predicción de primer orden a partir de la solución anterior, y la búsqueda completa queda para la primera solución o cuando la predicción falla.
+
+# In[2]:
+
+class Cancelado(Exception):
+    pass
+
+class Avance:
+    def __init__(self, solucion, version):
+        self.solucion = solucion
+        self.version = version
+        self.fraccion = 0.0
+
+    def __call__(self, fraccion):
+        if self.version != self.solucion.version: # Hay una solución más reciente, o se canceló
+            raise Cancelado()
+        if fraccion - self.fraccion >= 0.01: # Sin saturar la comunicación con los controles
+            self.fraccion = fraccion
+            self.solucion.progreso.value = fraccion
+
+class SolucionFondo:
+    def __init__(self):
+        self.ejecutor = ThreadPoolExecutor(max_workers = 1)
+        self.version = 0
+        self.tarea = None
+        self.progreso = FloatProgress(value = 0., min = 0., max = 1., description = 'Búsqueda')
+        boton_cancelar = Button(description = 'Cancelar')
+        boton_cancelar.on_click(lambda boton: self.cancelar())
+        self.salida = Output()
+        self.figura = VistaSolucion() # Una sola figura para todas las soluciones de este control
+        self.continuacion = Continuacion()
+        self.vista = VBox(children = [HBox(children = [self.progreso, boton_cancelar]), self.salida])
+
+    def en_curso(self):
+        return self.tarea != None and not self.tarea.done()
+
+    def cancelar(self):
+        self.version = self.version + 1
+        self.progreso.bar_style = 'warning'
+
+    def resolver(self, Vx, E_max, L, N, n):
+        self.version = self.version + 1
+        self.progreso.value = 0.
+        self.progreso.bar_style = ''
+        self.tarea = self.ejecutor.submit(self.ejecutar, Avance(self, self.version), Vx, E_max, L, N, n)
+        return self.tarea
+
+    def ejecutar(self, avance, Vx, E_max, L, N, n):
+        try:
+            potencial = potencial_muestreado(Vx, L, n)
+            solucion = self.continuacion.resolver(potencial, E_max, N, avance = avance)
+        except Cancelado:
+            return None
+        except Exception as error:
+            self.salida.outputs = ()
+            self.salida.append_display_data(HTML('<div class="alert alert-danger">'+\
+                '<strong>Error</strong> ' + str(error) + '</div>'))
+            return None
+        if avance.version != self.version: # Obsoleta, aunque haya terminado
+            return None
+        self.progreso.value = 1.
+        self.mostrar(potencial, N, solucion)
+        return solucion
+
+    def mostrar(self, potencial, N, solucion):
+        self.salida.outputs = ()
+        if solucion == None:
+            self.salida.append_display_data(alerta_discontinuidad())
+            return
+        E, x_vec, phi = solucion
+        self.salida.append_display_data(Latex('\(E_{' + str(N) + '} = ' + str(E) + '\)'))
+        graficar_solucion(potencial, E, x_vec, phi, self.figura)
+        self.salida.append_display_data(self.figura.figura)
+
+def relanzar_al_cambiar(controles, solucion, click):
+    for control in controles:
+        if isinstance(control, (IntSlider, FloatSlider)):
+            control.observe(lambda cambio: click(None) if solucion.en_curso() else None, names = 'value')
+
+
 # ### Funciones de potencial
 
 # Las soluciones de autovalores de energía de un sistema se asocian al potencial y geometría del sistema (condiciones de frontera para un problema sobre una línea por ser 1D), las cuales se deben imponer acorde a las condiciones físicas de interes. Para las condiciones de frontera sabemos que en los extremos estas deben anularse, así que solo hace falta describir el potencial al cual se esta sujeto.
@@ -49,7 +133,7 @@ from time import time
 # 
 # Estos pozos son los casos básicos de estudio por la facilidad para su desarrollo análitico e interpretación sencilla. Se puede ver en estos casos de estudio aplicaciones en ...  
 
-# In[2]:
+# In[3]:
 
 def V_inf(x):
     return 0
@@ -62,13 +146,16 @@ def V_fin(V_0, a, x):
 
 
 # Para efectos numéricos el infinito se traslada a una longitud grande comparativamente al ancho del pozo, la cual se designará como $L$. En el caso de que $a = L$, corresponde justamente al pozo infinito, de manera que la simulación de estos dos casos requiere un solo control y es basado en el potencial finito.  
+# 
+# Con los valores iniciales del control ($V_0 = 10$, $a = 5.2$, $L = 30$, $n = 300$) las paredes del pozo caen exactamente sobre nodos de la malla, y el primer nivel es $E_1 = 0.28421$, en lugar del $0.28057$ de la propagación con funciones de versiones anteriores (ver _Propagación sobre el potencial muestreado_ en `tecnicas_numericas`).  
 
-# In[3]:
+# In[4]:
 
 control_pozo = fun_contenedor_base()
 agregar_control(control_pozo, FloatSlider(value = 5.2, min = .5, max= 10., step= .1, description='a'))
 pozo_link = link((control_pozo.children[1], 'min'), (control_pozo.children[4], 'value'))
 boton_pozo = Button(description='Simular pozo')
+solucion_pozo = SolucionFondo()
 def click_pozo(boton):
     V_max = control_pozo.children[0].value
     L = control_pozo.children[1].value
@@ -76,11 +163,11 @@ def click_pozo(boton):
     n = control_pozo.children[3].value
     a = control_pozo.children[4].value
     Vx = lambda x: V_fin(V_max, a, x)
-    Solve_Schr(Vx, V_max, L, N, n)
-    clear_output(wait=True)
+    solucion_pozo.resolver(Vx, V_max, L, N, n)
 
 boton_pozo.on_click(click_pozo)
-display(control_pozo, boton_pozo)
+relanzar_al_cambiar(control_pozo.children, solucion_pozo, click_pozo)
+display(control_pozo, boton_pozo, solucion_pozo.vista)
 
 
 # __Potencial armonico__  
@@ -89,17 +176,18 @@ display(control_pozo, boton_pozo)
 # V(x) = \frac{\omega^2 x^2}{4}
 # \end{equation}
 
-# In[4]:
+# In[5]:
 
 def V_arm(omega, x):
     return omega**2 * x**2 / 4
 
 
-# In[5]:
+# In[6]:
 
 control_arm = fun_contenedor_base()
 agregar_control(control_arm, FloatSlider(value = 1., min = .1, max= 4., step= .1, description='$\omega$'))
 boton_arm = Button(description='Simular potencial')
+solucion_arm = SolucionFondo()
 def click_arm(boton):
     E_max = control_arm.children[0].value
     L = control_arm.children[1].value
@@ -107,11 +195,11 @@ def click_arm(boton):
     n = control_arm.children[3].value
     omega = control_arm.children[4].value
     Vx = lambda x: V_arm(omega, x)
-    Solve_Schr(Vx, E_max, L, N, n)
-    clear_output(wait=True)
+    solucion_arm.resolver(Vx, E_max, L, N, n)
 
 boton_arm.on_click(click_arm)
-display(control_arm, boton_arm)
+relanzar_al_cambiar(control_arm.children, solucion_arm, click_arm)
+display(control_arm, boton_arm, solucion_arm.vista)
 
 
 # __Potencial arbitrario__  
@@ -121,7 +209,7 @@ display(control_arm, boton_arm)
 # 
 # El bloque siguiente ilustra un problema de potencial armonico con anarmonicidad.
 
-# In[6]:
+# In[7]:
 
 control_arb = fun_contenedor_base()
 E_max = control_arb.children[0]
@@ -132,17 +220,23 @@ n.value = 300
 L.value = 20.
 
 str_potencial = Text(value='x**2 / 4 + x**3 / 50', description= 'Potencial')
-str_potencial.funcion = lambda x: eval(str_potencial.value)
+str_potencial.funcion = compilar_potencial(str_potencial.value)
 agregar_control(control_arb, str_potencial)
-# Ingrese un texto en formato python con dependencia solo de 'x'.
+# Ingrese un texto en formato python con dependencia solo de 'x', operaciones aritméticas y las funciones sin, cos, tan, sqrt, log, exp, abs y la constante pi.
+
+def error_potencial(error):
+    display(HTML('<div class="alert alert-danger">'+\
+         '<strong>Error</strong> ' + str(error) + '</div>'))
 
 def ingreso_potencial(str_potencial):
-    str_potencial.funcion = lambda x: eval(str_potencial.value)
-    Vx = str_potencial.funcion
-    h = L.value / n.value
-    V_vec = [Vx(-L.value/2 + h*i) for i in range(n.value + 1)]
-    V_min = min(V_vec)
-    V_max = max(V_vec)
+    try:
+        str_potencial.funcion = compilar_potencial(str_potencial.value)
+        potencial = potencial_muestreado(str_potencial.funcion, L.value, n.value) # Se reutiliza al simular
+    except (SyntaxError, ValueError, ArithmeticError, TypeError) as error: # Expresión no válida, o que falla al evaluarse
+        error_potencial(error)
+        return
+    V_min = potencial.V_min
+    V_max = potencial.V_max
     dV = (V_max - V_min) / 50
     E_max.step = dV
     E_max.min = V_min
@@ -151,18 +245,24 @@ def ingreso_potencial(str_potencial):
 
 #ingreso_potencial(str_potencial)
 boton_arb = Button(description='Simular potencial')
+solucion_arb = SolucionFondo()
     
 def click_arbitrario(boton):
-    Vx = str_potencial.funcion
-    Solve_Schr(Vx, E_max.value, L.value, N.value, n.value)
-    clear_output(wait=True)
+    try:
+        Vx = compilar_potencial(str_potencial.value) # Compilado una sola vez por texto
+    except (SyntaxError, ValueError, ArithmeticError, TypeError) as error:
+        error_potencial(error)
+        return
+    str_potencial.funcion = Vx
+    solucion_arb.resolver(Vx, E_max.value, L.value, N.value, n.value)
 
 str_potencial.on_submit(ingreso_potencial)
 boton_arb.on_click(click_arbitrario)
-display(control_arb, boton_arb)
+relanzar_al_cambiar(control_arb.children, solucion_arb, click_arbitrario)
+display(control_arb, boton_arb, solucion_arb.vista)
 
 
-# Para potenciales no simétricos y con amplias diferencias entre el potencial máximo y mínimo se recomienda usar instancias directas de python e ipython, debido al comportamiento como servidor de las instancias de Jupyter, que provocan la terminación del llamado al kernel tras un \textit{timeout}, de aproximadamente minuto y medio. Tras este periodo se recomienda reiniciar el kernel (tanto si es de ejecución local como en linea).  
+# Para potenciales no simétricos y con amplias diferencias entre el potencial máximo y mínimo la búsqueda puede tomar varios segundos. Como los botones de simulación resuelven en segundo plano (`SolucionFondo`), el llamado al kernel no alcanza el \textit{timeout} de las instancias de Jupyter (de aproximadamente minuto y medio), y una solución demasiado larga se puede cancelar sin reiniciar el kernel. Al llamar directamente `Solve_Schr` el cálculo sigue siendo bloqueante.  
 # 
 # El caso con los siguientes parámetros toma 256s su solución y no es posible realizarlo en el notebook.  
 # + $L = 20$
@@ -175,23 +275,27 @@ display(control_arb, boton_arb)
 # 
 # ![Función de onda solución](x2_4p03x3.png "Función de onda solución al potencial $\frac{x^2}{4} + 0.3 x^3$")
 
+# In[8]:
+
 def arm_unarm():
     L = 20
     N = 1
     n = 300
     Vx = lambda x: x**2 / 4 + 0.3 * x**3
     
-    x, V_vec = discretizar(Vx, -L/2, L/2, n)
-    V_min = min(V_vec)
-    V_max = max(V_vec)
+    potencial = PotencialMuestreado(Vx, L, n)
+    V_min = potencial.V_min
+    V_max = potencial.V_max
     
     E_max = V_max
     print(V_min, V_max)
     
-    return Solve_Schr(Vx, E_max, L, N, n) # E, x, phi
+    return Solve_Schr(potencial, E_max, L, N, n) # E, x, phi
 
 def arm_unarm_time():
     inicio = time()
     arm_unarm()
     final = time()
-    return final - inicio
\ No newline at end of file
+    return final - inicio
+
+
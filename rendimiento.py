@@ -0,0 +1,281 @@
+# coding: utf-8
+
+# # Rendimiento de las técnicas numéricas
+#
+# Este módulo mide las rutas críticas de la búsqueda de autovalores (`biseccion`, `brent`, `incremental`, `raiz_n`, `estacionario`, `numerov`, `Phi` y la búsqueda completa con `E_N`) sobre casos de referencia fijos: el pozo finito, el oscilador armónico, el potencial anarmónico $\frac{x^2}{4} + 0.3 x^3$ de `estados_ligados`, su variante acotada $\frac{x^2}{4} + 0.3 x^4$ y un pozo doble simétrico. Para cada medición se registra el tiempo (el mejor de varias repeticiones para las operaciones cortas), el número de evaluaciones del residuo (o del potencial, para las funciones que reciben $K$) y el error del autovalor frente a un valor de referencia: analítico para el pozo finito y el oscilador, y de diferencias finitas con una malla fina (`espectro_tridiagonal`) para los demás. También se mide el tiempo de importación de `tecnicas_numericas`, sola y junto con `vis_int`.
+#
+# Los resultados se guardan en JSON, de forma que se puedan comparar entre versiones con `comparar_rendimiento`:
+#
+#     python rendimiento.py resultados.json --anterior resultados_previos.json
+
+import os
+import sys
+import json
+import subprocess
+import platform
+import argparse
+from time import perf_counter, strftime
+from math import sqrt, sin, cos
+import numpy as np
+from tecnicas_numericas import *
+
+
+# ### Casos de referencia
+#
+# Cada caso fija el potencial, el intervalo $L$, la malla $n$, la energía máxima (absoluta) y los niveles a verificar. En el pozo finito (profundidad $V_0$, ancho $a$) las energías exactas son las raíces de las condiciones de empate par e impar, $k \sin(ka/2) - \kappa \cos(ka/2) = 0$ y $k \cos(ka/2) + \kappa \sin(ka/2) = 0$, con $k = \sqrt{E}$ y $\kappa = \sqrt{V_0 - E}$, escritas sin polos; en el oscilador $V = x^2$ son $E_N = 2N - 1$. El caso anarmónico es el de `estados_ligados`, $\frac{x^2}{4} + 0.3 x^3$ con $L = 20$, $n = 300$ y $E_{max} = 325$: su mínimo está en la frontera izquierda ($V(-10) = -275$), y los primeros niveles se concentran contra ella, pero todos los métodos resuelven la misma caja, de manera que la referencia de diferencias finitas con la malla fina es válida. El disparo (`barrido`, `nodos`, `adaptativo`) da $E_1, E_2, E_3 = -241.03, -208.96, -184.01$, frente a $-231.27, -200.49, -176.54$ de `espectro_tridiagonal` y $-231.14, -200.11, -175.90$ de la malla mapeada; la diferencia de casi 10 no es de la caja sino del residuo de `numerov` en este caso, y el caso se conserva para que el error aparezca en el reporte. El término cuártico, $\frac{x^2}{4} + 0.3 x^4$ con $L = 10$, es la variante acotada del mismo caso.
+
+def niveles_pozo_finito(V_0, a, niveles):
+    def empate(E):
+        k = sqrt(E)
+        kappa = sqrt(V_0 - E)
+        return (k * sin(k*a/2) - kappa * cos(k*a/2)) * (k * cos(k*a/2) + kappa * sin(k*a/2))
+    return [raiz_n(empate, 1e-9, V_0 - 1e-9, N, 1e-3, 1e-12, brent) for N in niveles]
+
+def niveles_tridiagonal(Vx, E_max, L, niveles, n_ref):
+    potencial = PotencialMuestreado(Vx, L, n_ref)
+    E_vec, estados = espectro_tridiagonal(potencial.V_rel, E_max - potencial.V_min, L, n_ref)
+    return [float(E_vec[N - 1]) + potencial.V_min for N in niveles]
+
+def casos_referencia(n_ref = None):
+    n_ref = n_ref or (20000 if cargar_eigh_tridiagonal() != None else 2000) # Sin scipy la diagonalización es densa
+    casos = [
+        {'caso': 'pozo_finito', 'Vx': lambda x: 0 if abs(x) < 1.25 else 10, 'L': 12, 'n': 300, 'E_max': 10, 'niveles': (1, 2, 3),
+         'referencia': lambda: niveles_pozo_finito(10, 2.5, (1, 2, 3))},
+        {'caso': 'armonico', 'Vx': lambda x: x**2, 'L': 10, 'n': 300, 'E_max': 6, 'niveles': (1, 2, 3),
+         'referencia': lambda: [1.0, 3.0, 5.0]},
+        {'caso': 'anarmonico', 'Vx': lambda x: x**2 / 4 + 0.3 * x**3, 'L': 20, 'n': 300, 'E_max': 325, 'niveles': (1, 2, 3)},
+        {'caso': 'anarmonico_x4', 'Vx': lambda x: x**2 / 4 + 0.3 * x**4, 'L': 10, 'n': 300, 'E_max': 12, 'niveles': (1, 2, 3)},
+        {'caso': 'pozo_doble', 'Vx': lambda x: (x**2 - 4)**2 / 8, 'L': 10, 'n': 300, 'E_max': 4, 'niveles': (1, 2, 3)},
+    ]
+    for caso in casos:
+        if 'referencia' in caso:
+            caso['E_ref'] = caso.pop('referencia')()
+        else:
+            caso['E_ref'] = niveles_tridiagonal(caso['Vx'], caso['E_max'], caso['L'], caso['niveles'], n_ref)
+        caso['n_ref'] = n_ref
+    return casos
+
+
+# ### Mediciones
+#
+# Las funciones originales (`estacionario`, `numerov`, `Phi`) reciben $K(E, x)$, de manera que para ellas se cuentan las evaluaciones del potencial; para los refinamientos y búsquedas se cuentan las evaluaciones del residuo de `numerov_vec`. `biseccion` y `brent` refinan el mismo intervalo de ancho $10^{-2}$, no centrado, alrededor de la raíz del disparo, y las búsquedas con `incremental`, `raiz_n` y `E_N` parten de cero (relativo al mínimo del potencial) con el paso `delta_e`.
+
+def cronometrar(funcion, repeticiones = 1):
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = perf_counter()
+        resultado = funcion()
+        tiempos.append(perf_counter() - inicio)
+    return resultado, min(tiempos)
+
+def registro(caso, prueba, N, tiempo, evaluaciones, E = None, E_ref = None, residuo = None):
+    return {'caso': caso['caso'], 'prueba': prueba, 'N': N, 'tiempo': tiempo, 'evaluaciones': evaluaciones,
+            'E': None if E == None else float(E), 'E_ref': E_ref, 'residuo': None if residuo == None else float(residuo),
+            'error': None if E == None or E_ref == None else abs(float(E) - E_ref)}
+
+def medir_propagacion(caso, repeticiones = 5):
+    Vx, L, n = caso['Vx'], caso['L'], caso['n']
+    potencial = PotencialMuestreado(Vx, L, n)
+    V_vec = potencial.V_rel
+    E = caso['E_ref'][0]
+    K = Contador(lambda e, x: e - Vx(x))
+    registros = []
+    p_est, tiempo = cronometrar(lambda: estacionario(lambda x: K(E, x), L, L / n), repeticiones)
+    registros.append(registro(caso, 'estacionario', 1, tiempo, K.evaluaciones // repeticiones))
+    cruces = CrucesPotencial(V_vec, L, n)
+    p_est, tiempo = cronometrar(lambda: cruces.empate(E - potencial.V_min), repeticiones)
+    registros.append(registro(caso, 'estacionario_vec', 1, tiempo, 0))
+    K.evaluaciones = 0
+    residuo, tiempo = cronometrar(lambda: numerov(K, L, E, 1, n), repeticiones)
+    registros.append(registro(caso, 'numerov', 1, tiempo, K.evaluaciones // repeticiones, residuo = residuo))
+    residuo, tiempo = cronometrar(lambda: numerov_vec(V_vec, L, E - potencial.V_min, 1, n, cruces), repeticiones)
+    registros.append(registro(caso, 'numerov_vec', 1, tiempo, 1, residuo = residuo))
+    K.evaluaciones = 0
+    estado, tiempo = cronometrar(lambda: Phi(K, L, E, 1, n), repeticiones)
+    registros.append(registro(caso, 'Phi', 1, tiempo, K.evaluaciones // repeticiones))
+    estado, tiempo = cronometrar(lambda: Phi_vec(V_vec, L, E - potencial.V_min, 1, n, cruces), repeticiones)
+    registros.append(registro(caso, 'Phi_vec', 1, tiempo, 1))
+    return registros
+
+def medir_refinamiento(caso, tol_e = 1e-6):
+    L, n = caso['L'], caso['n']
+    potencial = PotencialMuestreado(caso['Vx'], L, n)
+    V_vec, V_min = potencial.V_rel, potencial.V_min
+    registros = []
+    for N, E_ref in zip(caso['niveles'], caso['E_ref']):
+        E_disparo = E_N(V_vec, caso['E_max'] - V_min, L, N, n, 1e-3, 1e-10, numerov_vec, 'barrido', False, brent)
+        if E_disparo == None:
+            continue
+        for refinar in (biseccion, brent):
+            residuo = Contador(lambda e: numerov_vec(V_vec, L, e, N, n))
+            E, tiempo = cronometrar(lambda: refinar(residuo, E_disparo - 7e-3, E_disparo + 3e-3, tol_e))
+            registros.append(registro(caso, refinar.__name__, N, tiempo, residuo.evaluaciones,
+                                      None if E == None else E + V_min, E_ref))
+    return registros
+
+def medir_busqueda(caso, delta_e = 1e-3, tol_e = 1e-6, metodos = ('incremental', 'barrido', 'adaptativo', 'nodos')):
+    L, n = caso['L'], caso['n']
+    potencial = PotencialMuestreado(caso['Vx'], L, n)
+    V_vec, V_min = potencial.V_rel, potencial.V_min
+    E_max = caso['E_max'] - V_min
+    registros = []
+    residuo = Contador(lambda e: numerov_vec(V_vec, L, e, 1, n))
+    E, tiempo = cronometrar(lambda: incremental(residuo, tol_e, E_max, delta_e, tol_e, brent))
+    registros.append(registro(caso, 'incremental', 1, tiempo, residuo.evaluaciones,
+                              None if E == None else E + V_min, caso['E_ref'][0]))
+    for N, E_ref in zip(caso['niveles'], caso['E_ref']):
+        residuo = Contador(lambda e: numerov_vec(V_vec, L, e, N, n))
+        E, tiempo = cronometrar(lambda: raiz_n(residuo, tol_e, E_max, N, delta_e, tol_e, brent))
+        registros.append(registro(caso, 'raiz_n', N, tiempo, residuo.evaluaciones, None if E == None else E + V_min, E_ref))
+        for metodo in metodos:
+            propagador = Contador(numerov_vec)
+            E, tiempo = cronometrar(lambda: E_N(V_vec, E_max, L, N, n, delta_e, tol_e, propagador, metodo, False, brent))
+            registros.append(registro(caso, 'E_N_' + metodo, N, tiempo, propagador.evaluaciones,
+                                      None if E == None else E + V_min, E_ref))
+    return registros
+
+# ### Núcleos de propagación
+#
+# `verificar_nucleos` propaga las mismas energías (un lote uniforme en $[0, E_{max}]$, relativo al mínimo del potencial) con cada núcleo disponible de `nucleos_numerov` y reporta la mayor diferencia de los residuos frente al núcleo `python`, relativa a $\max(1, |r|)$ para no exagerar la diferencia cerca de los polos. `medir_nucleos` mide con cada núcleo una propagación individual (`numerov_vec`) y un lote (`numerov_barrido`); la aceleración se reporta frente a `python`. La primera llamada a cada núcleo se hace por fuera de la medición, de forma que no se cuenta la compilación de `numba`.
+
+def residuos_nucleo(nombre, V_vec, L, E_vec, n):
+    usar_nucleo(nombre)
+    try:
+        return numerov_barrido(V_vec, L, E_vec, n), np.array([numerov_vec(V_vec, L, E, 1, n) for E in E_vec])
+    finally:
+        usar_nucleo(None)
+
+def verificar_nucleos(casos = None, energias = 200, tol = 1e-9):
+    diferencias = []
+    for caso in casos or casos_referencia():
+        L, n = caso['L'], caso['n']
+        potencial = PotencialMuestreado(caso['Vx'], L, n)
+        E_vec = np.linspace(0, caso['E_max'] - potencial.V_min, energias + 1)[1:]
+        lote_ref, individual_ref = residuos_nucleo('python', potencial.V_rel, L, E_vec, n)
+        for nombre in nucleos_disponibles():
+            lote, individual = residuos_nucleo(nombre, potencial.V_rel, L, E_vec, n)
+            diferencia = max(float(np.nanmax(np.abs(r - r_ref) / np.maximum(1, np.abs(r_ref))))
+                             for r, r_ref in ((lote, lote_ref), (individual, individual_ref)))
+            diferencias.append({'caso': caso['caso'], 'nucleo': nombre, 'diferencia': diferencia, 'equivalente': diferencia <= tol})
+    return diferencias
+
+def medir_nucleos(caso, energias = 2000, repeticiones = 5):
+    L, n = caso['L'], caso['n']
+    potencial = PotencialMuestreado(caso['Vx'], L, n)
+    V_vec = potencial.V_rel
+    E = caso['E_ref'][0] - potencial.V_min
+    E_vec = np.linspace(0, caso['E_max'] - potencial.V_min, energias + 1)[1:]
+    registros = []
+    for nombre in nucleos_disponibles():
+        usar_nucleo(nombre)
+        try:
+            numerov_vec(V_vec, L, E, 1, n) # Compilación, por fuera de la medición
+            residuo, tiempo = cronometrar(lambda: numerov_vec(V_vec, L, E, 1, n), repeticiones)
+            registros.append(registro(caso, 'nucleo_' + nombre, 1, tiempo, 1, residuo = residuo))
+            if nombre != 'python': # El lote con python es un ciclo de numerov_vec
+                residuos, tiempo = cronometrar(lambda: numerov_barrido(V_vec, L, E_vec, n), repeticiones)
+                registros.append(registro(caso, 'nucleo_' + nombre + '_lote', 1, tiempo, energias))
+        finally:
+            usar_nucleo(None)
+    return registros
+
+def aceleracion_nucleos(registros):
+    referencia = dict([(r['caso'], r['tiempo']) for r in registros if r['prueba'] == 'nucleo_python'])
+    return [(r['caso'], r['prueba'][len('nucleo_'):], referencia[r['caso']] * r['evaluaciones'] / r['tiempo'])
+            for r in registros if r['prueba'].startswith('nucleo_') and r['caso'] in referencia]
+
+def medir_rendimiento(delta_e = 1e-3, tol_e = 1e-6, repeticiones = 5, n_ref = None):
+    registros = []
+    casos = casos_referencia(n_ref)
+    for caso in casos:
+        registros.extend(medir_propagacion(caso, repeticiones))
+        registros.extend(medir_refinamiento(caso, tol_e))
+        registros.extend(medir_busqueda(caso, delta_e, tol_e))
+        registros.extend(medir_nucleos(caso, repeticiones = repeticiones))
+    registros.extend(medir_importacion(repeticiones))
+    return {'fecha': strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(), 'numpy': np.__version__,
+            'plataforma': platform.platform(), 'delta_e': delta_e, 'tol_e': tol_e, 'registros': registros,
+            'nucleos': verificar_nucleos(casos)}
+
+
+# ### Tiempo de importación
+#
+# `medir_importacion` mide en un proceso nuevo, sin módulos ya cargados, la importación de `tecnicas_numericas` sola (la ruta de los procesos de trabajo, los barridos en lote y este módulo) y junto con `vis_int` (la ruta de los notebooks, con los _widgets_ y matplotlib), y registra el mejor tiempo de varias repeticiones. El arranque del intérprete no se cuenta. Si `vis_int` no se puede importar (sin ipywidgets o matplotlib), su ruta se omite.
+
+def tiempo_importacion(modulos):
+    codigo = 'from time import perf_counter\ninicio = perf_counter()\nimport ' + ', '.join(modulos) + '\nprint(perf_counter() - inicio)'
+    try:
+        salida = subprocess.run([sys.executable, '-c', codigo], capture_output = True, text = True, check = True,
+                                cwd = os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.CalledProcessError:
+        return None
+    return float(salida.stdout.split()[-1])
+
+def medir_importacion(repeticiones = 3):
+    registros = []
+    for prueba, modulos in (('importar', ('tecnicas_numericas',)), ('importar_vis_int', ('vis_int', 'tecnicas_numericas'))):
+        tiempos = [tiempo_importacion(modulos) for i in range(repeticiones)]
+        if None not in tiempos:
+            registros.append(registro({'caso': 'importacion'}, prueba, 0, min(tiempos), 0))
+    return registros
+
+
+# ### Comparación entre versiones
+#
+# `comparar_rendimiento` empareja los registros de dos ejecuciones por caso, prueba y nivel, y reporta como regresión un tiempo mayor en más de `factor_tiempo` veces (y en más de `min_tiempo` segundos, para no confundir el ruido de las mediciones cortas), más evaluaciones, o un error del autovalor mayor (con una holgura `tol_error`), además de los autovalores que se dejaron de encontrar.
+
+def comparar_rendimiento(anterior, actual, factor_tiempo = 1.5, min_tiempo = 5e-3, tol_error = 1e-9):
+    previos = dict([((r['caso'], r['prueba'], r['N']), r) for r in anterior['registros']])
+    regresiones = []
+    for r in actual['registros']:
+        previo = previos.get((r['caso'], r['prueba'], r['N']))
+        if previo == None:
+            continue
+        motivos = []
+        if r['tiempo'] > factor_tiempo * previo['tiempo'] and r['tiempo'] - previo['tiempo'] > min_tiempo:
+            motivos.append('tiempo')
+        if r['evaluaciones'] > previo['evaluaciones']:
+            motivos.append('evaluaciones')
+        if previo['E'] != None and r['E'] == None:
+            motivos.append('sin autovalor')
+        elif previo['error'] != None and r['error'] != None and r['error'] > previo['error'] + tol_error:
+            motivos.append('error')
+        if motivos:
+            regresiones.append({'caso': r['caso'], 'prueba': r['prueba'], 'N': r['N'], 'motivos': motivos,
+                                'anterior': previo, 'actual': r})
+    return regresiones
+
+def imprimir_rendimiento(resultados):
+    for r in resultados['registros']:
+        error = '' if r['error'] == None else '%.2e' % r['error']
+        print('%-12s %-18s %2d %10.6f s %8d %10s' % (r['caso'], r['prueba'], r['N'], r['tiempo'], r['evaluaciones'], error))
+
+def main(argumentos = None):
+    parser = argparse.ArgumentParser(description = 'Rendimiento de las técnicas numéricas sobre casos de referencia.')
+    parser.add_argument('salida', help = 'archivo JSON de resultados')
+    parser.add_argument('--anterior', help = 'resultados de una versión anterior, para buscar regresiones')
+    parser.add_argument('--delta-e', type = float, default = 1e-3)
+    parser.add_argument('--tol-e', type = float, default = 1e-6)
+    parser.add_argument('--repeticiones', type = int, default = 5)
+    argumentos = parser.parse_args(argumentos)
+    resultados = medir_rendimiento(argumentos.delta_e, argumentos.tol_e, argumentos.repeticiones)
+    with open(argumentos.salida, 'w') as archivo:
+        json.dump(resultados, archivo, indent = 1)
+    imprimir_rendimiento(resultados)
+    for caso, nucleo, aceleracion in aceleracion_nucleos(resultados['registros']):
+        print('%-12s %-18s %8.2fx frente a python' % (caso, nucleo, aceleracion))
+    diferentes = [d for d in resultados['nucleos'] if not d['equivalente']]
+    for d in diferentes:
+        print('Núcleo no equivalente:', d['caso'], d['nucleo'], '%.2e' % d['diferencia'])
+    if diferentes:
+        return 1
+    if argumentos.anterior:
+        with open(argumentos.anterior) as archivo:
+            regresiones = comparar_rendimiento(json.load(archivo), resultados)
+        for regresion in regresiones:
+            print('Regresión:', regresion['caso'], regresion['prueba'], regresion['N'], ', '.join(regresion['motivos']))
+        return 1 if regresiones else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,29 @@
 # coding: utf-8
 
 # <div class="alert alert-success">
-# Este notebook de ipython depende del modulo `vis_int`, el cual es ilustrado en el notebook de [Visualización e Interacción](vis_int.ipybn).
+# Este notebook de ipython depende del modulo `vis_int`, el cual es ilustrado en el notebook de [Visualización e Interacción](vis_int.ipybn), solo para las gráficas y los controles.
 # </div>
+# 
+# Las técnicas numéricas (búsqueda de raíces, propagación de Numerov y solución de la ecuación de Schrödinger) no dependen de IPython, de los _widgets_ ni de matplotlib, de manera que el módulo se puede importar desde python sin interfaz (procesos de trabajo, barridos en lote). Las funciones que grafican o crean controles (`Solve_Schr`, `graficar_solucion`, `disparo`, `fun_contenedor_base`) importan `vis_int` al usarse por primera vez.
 
 # In[1]:
 
-from vis_int import *
+from math import sin, cos, tan, sqrt, log, exp, pi, asinh, hypot
+import numpy as np
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from collections import OrderedDict
+from hashlib import sha1
+from contextlib import nullcontext
+from time import perf_counter
+from threading import RLock
+import ast
+import os
+import json
+import warnings
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
+#from vis_int import *
 #import vis_int
 #print(dir(vis_int))
 
@@ -64,7 +81,7 @@ def biseccion(funcion, a, b, tol_x = 1e-6, factor_ty = 1e2):
         else: # En caso de ser asintota vertical con cambio de signo
             return None
 
-def incremental(funcion, a, b, delta_x = 1e-4, tol_x = 1e-6):
+def incremental(funcion, a, b, delta_x = 1e-4, tol_x = 1e-6, refinar = biseccion):
     c0 = a
     f0 = funcion(c0)
     c1 = c0 + delta_x
@@ -79,7 +96,7 @@ def incremental(funcion, a, b, delta_x = 1e-4, tol_x = 1e-6):
         if c1 > b: # Final del intervalo, equivalente f0*f1 > 0
             return None
         else: # Sub-intervalo con cambio de signo
-            c = biseccion(funcion, c0, c1, tol_x) # Se invoca bisección para mejorar aproximación
+            c = refinar(funcion, c0, c1, tol_x) # Se invoca bisección para mejorar aproximación
             if c == None: # Si el candidato era discontinuidad, incremental avanza
                 c0 = c1
                 f0 = f1
@@ -101,26 +118,100 @@ def incremental(funcion, a, b, delta_x = 1e-4, tol_x = 1e-6):
 
 # In[3]:
 
-def raiz_n(funcion, a, b, N, delta_x = 1e-4, tol_x = 1e-6):
-    c0 = a
+def raiz_n(funcion, a, b, N, delta_x = 1e-4, tol_x = 1e-6, refinar = biseccion):
     cont_raiz = 0
-    while c0 < b and cont_raiz < N:
-        c = incremental(funcion, c0, b, delta_x, tol_x)
-        if c == None: # Si incremental termina en 'None', no hay más raíces
-            return None
+    for c in raices(funcion, a, b, delta_x, tol_x, refinar):
         cont_raiz = cont_raiz + 1
+        if cont_raiz == N:
+            return c
+    return None
+
+def raices(funcion, a, b, delta_x = 1e-4, tol_x = 1e-6, refinar = biseccion):
+    c0 = a
+    while c0 < b:
+        c = incremental(funcion, c0, b, delta_x, tol_x, refinar)
+        if c == None: # Si incremental termina en 'None', no hay más raíces
+            return
+        yield c # Cada raíz se entrega apenas se refina, sin buscar las siguientes
         c0 = c + delta_x
-    if cont_raiz == N:
-        return c
-    else:
+
+
+# Las raíces anteriores a la $N$ se encuentran en el camino, de manera que `raices` las entrega una a una en orden, apenas se refinan, como un generador: quien solo necesita las primeras deja de iterar y no paga la búsqueda de las demás. `raiz_n` toma la $N$-ésima de este generador.
+
+# Cada evaluación de la función en la búsqueda de autovalores corresponde a una propagación completa de Numerov, de manera que conviene refinar los intervalos candidatos con pocas evaluaciones. El [método de Brent](https://en.wikipedia.org/wiki/Brent%27s_method) combina la interpolación (secante o cuadrática inversa) con la bisección como salvaguarda: conserva siempre un intervalo con cambio de signo y converge de forma superlineal para funciones suaves, con el mismo criterio de parada de `biseccion` (intervalo menor que la tolerancia) y la misma verificación de raíz frente a asíntota con `factor_ty`. La clase `Contador` envuelve una función y cuenta sus evaluaciones, para comparar el costo de cada método.
+
+# In[4]:
+
+def brent(funcion, a, b, tol_x = 1e-6, factor_ty = 1e2):
+    fa = funcion(a)
+    fb = funcion(b)
+    if abs(fa) < tol_x: # Se verifica que los extremos sean raices
+        return a
+    elif abs(fb) < tol_x:
+        return b
+    elif not fa * fb < 0: # Sin cambio de signo, o evaluación no numérica
+        return None
+    c, fc = a, fa
+    d = e = b - a
+    while True:
+        if fb * fc > 0: # c es el extremo con signo opuesto a b
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = tol_x / 2.0
+        m = (c - b) / 2.0
+        if abs(m) <= tol or abs(fb) < tol_x:
+            break
+        if abs(e) >= tol and abs(fa) > abs(fb): # Se intenta interpolar
+            s = fb / fa
+            if a == c: # Secante
+                p = 2 * m * s
+                q = 1 - s
+            else: # Cuadrática inversa
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            else:
+                p = -p
+            if 2 * p < min(3 * m * q - abs(tol * q), abs(e * q)):
+                e = d
+                d = p / q
+            else: # Interpolación rechazada, se bisecta
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        if abs(d) > tol:
+            b = b + d
+        else:
+            b = b + (tol if m > 0 else -tol)
+        fb = funcion(b)
+    if abs(fb) < tol_x * factor_ty: # Se verifica que efectivamente sea raiz
+        return b
+    else: # En caso de ser asintota vertical con cambio de signo
         return None
 
+class Contador:
+    def __init__(self, funcion):
+        self.funcion = funcion
+        self.__name__ = getattr(funcion, '__name__', 'funcion')
+        self.evaluaciones = 0
+
+    def __call__(self, *args):
+        self.evaluaciones = self.evaluaciones + 1
+        return self.funcion(*args)
+
 
 # A continuación se ilustra el uso de la técnica con la función trascendental del problema del pozo finito simetrico con paridad par, que en la forma adimensional corresponde a:  
 # $$ \sqrt{E} - \sqrt{V_0 - E} \tan\left( \frac{\sqrt{V_0 - E}a}{2} \right) = 0, $$  
 # con $a$ el ancho del pozo, $V_0$ es la profundidad del pozo (con referencia desde cero por convención).
 
-# In[6]:
+# In[5]:
 
 #def trascendental(E, V_0, a):
 #    k2 = sqrt(V_0 - E)
@@ -159,7 +250,7 @@ def raiz_n(funcion, a, b, N, delta_x = 1e-4, tol_x = 1e-6):
 
 # La función `estacionario` se define para buscar el punto de empate adecuado para el análisis de la continuidad de la función de onda y su derivada. Como criterio, se buscan los _turning points_ clásicos, donde $E=V(x)$.  
 
-# In[17]:
+# In[6]:
 
 def estacionario(K, L, h):
     x = -L/2
@@ -199,8 +290,7 @@ def estacionario(K, L, h):
 #        return 0
 
 
-
-# In[8]:
+# In[7]:
 
 def numerov(K_ex, L, E, N, n):
     h = L / n
@@ -290,20 +380,501 @@ def Phi(K_ex, L, E, N, n):
     return x_g, phi_g
 
 
+# ### Propagación sobre el potencial muestreado
+# 
+# Las funciones `numerov` y `Phi` evalúan $K(x)$ tres veces por paso, y con ello el potencial del usuario unas $3n$ veces por cada energía de prueba. Como la malla $x_i = -L/2 + ih$ no depende de la energía, basta con muestrear el potencial una sola vez por cada par $(L, n)$ y para cada energía solo formar $K_i = E - V_i$ y los coeficientes de Numerov,
+# $$ c^{(0)}_i = 1 + \frac{h^2 K_i}{12}, \qquad c^{(1)}_i = 2 - \frac{5h^2 K_i}{6}. $$
+# La muestra incluye los puntos $x_{n+1}$ y $x_{-1}$ (este último al final del arreglo, de forma que el índice $-1$ lo alcanza), ya que los últimos pasos de cada propagación requieren $K(x \pm h)$ por fuera del intervalo. Las recurrencias y el criterio de empate son los mismos de `numerov`, `Phi` y `estacionario`; para que el residuo del disparo coincida con el de la versión con funciones, las comparaciones contra el punto de empate se hacen con las mismas posiciones acumuladas ($x = x + h$ y $x = x - h$) de esas funciones, que se calculan una sola vez por malla. La única diferencia se presenta cuando una discontinuidad del potencial cae exactamente sobre un nodo de la malla: la versión con funciones evalúa el potencial en las posiciones acumuladas, que por el redondeo pueden quedar a uno u otro lado de la discontinuidad (y a lados distintos en la propagación desde la izquierda y en la propagación desde la derecha), mientras que la muestra usa el nodo exacto $x_i$ en ambas propagaciones. Es el caso del control del pozo finito con sus valores iniciales ($V_0 = 10$, $a = 5.2$, $L = 30$, $n = 300$), cuyas paredes en $x = \pm 2.6$ caen sobre los nodos $i = 124$ y $i = 176$: el primer nivel pasa de $E_1 = 0.28057$ con `numerov` a $E_1 = 0.28421$ con `numerov_vec` (el valor analítico es $0.28983$, y el de diferencias finitas sobre la misma malla es $0.28900$). Cuando las paredes no caen sobre nodos, como con $a = 5.25$, ambas versiones coinciden.
+# 
+# La clase `PotencialMuestreado` reúne la malla, la muestra del potencial, su mínimo y máximo, y la muestra desplazada $V - V_{min}$ que usan los métodos de búsqueda, junto con cantidades derivadas (como la huella para la cache) que se calculan una sola vez. Todas las etapas, desde la búsqueda de autovalores hasta la gráfica y los rangos de los controles, reutilizan el mismo objeto, de manera que el potencial se evalúa una sola vez por cada $(L, n)$. Para los potenciales de `compilar_potencial`, que no cambian, el objeto además se reutiliza entre llamados.
+
+# In[8]:
+
+def muestrear(Vx, L, n):
+    h = L / n
+    indices = list(range(n + 2)) + [-1]
+    if perfil_activo != None:
+        perfil_activo.contar('potencial', len(indices))
+    if getattr(Vx, 'vectorizada', False): # Potenciales de compilar_potencial, evaluados en toda la malla a la vez
+        return np.asarray(Vx(-L/2 + np.array(indices) * h), dtype=float)
+    return np.array([Vx(-L/2 + i*h) for i in indices], dtype=float)
+
+class PotencialMuestreado:
+    __slots__ = ('Vx', 'L', 'n', 'h', 'x', 'V', 'V_min', 'V_max', 'V_rel', 'derivados')
+
+    def __init__(self, Vx, L, n):
+        self.Vx = Vx # Para volver a muestrear en otra malla
+        self.L = L
+        self.n = n
+        self.h = L / n
+        self.V = muestrear(Vx, L, n) # Única evaluación del potencial para este (L, n)
+        self.x = [-L/2 + i*self.h for i in range(n + 1)]
+        self.V_min = float(min(self.V[:n + 1]))
+        self.V_max = float(max(self.V[:n + 1]))
+        self.V_rel = self.V - self.V_min
+        self.derivados = {}
+
+    def V_malla(self):
+        return self.V[:self.n + 1]
+
+    def derivado(self, nombre, calcular):
+        if nombre not in self.derivados:
+            self.derivados[nombre] = calcular(self)
+        return self.derivados[nombre]
+
+    def huella(self):
+        return self.derivado('huella', lambda potencial: huella_muestra(potencial.V))
+
+    def cruces(self):
+        return self.derivado('cruces', lambda potencial: CrucesPotencial(potencial.V_rel, potencial.L, potencial.n))
+
+    def simetrico(self):
+        return self.derivado('simetrico', lambda potencial: simetria_muestra(potencial.V_malla()))
+
+def huella_muestra(V_muestra):
+    return sha1(np.ascontiguousarray(V_muestra, dtype=float).tobytes()).hexdigest()
+
+def simetria_muestra(V_muestra, tol = 1e-10): # V(-x) = V(x) sobre los nodos x_i y x_(n-i)
+    escala = max(1.0, float(np.abs(V_muestra[np.isfinite(V_muestra)]).max(initial = 0.0)))
+    return bool(np.allclose(V_muestra, V_muestra[::-1], rtol = tol, atol = tol * escala))
+
+@lru_cache(maxsize=32)
+def potencial_compilado(Vx, L, n):
+    return PotencialMuestreado(Vx, L, n)
+
+def potencial_muestreado(Vx, L, n):
+    if isinstance(Vx, PotencialMuestreado):
+        return Vx
+    elif getattr(Vx, 'vectorizada', False): # Los potenciales compilados no cambian, se reutiliza su muestra
+        return potencial_compilado(Vx, L, n)
+    return PotencialMuestreado(Vx, L, n)
+
+@lru_cache(maxsize=32)
+def malla_numerov(L, n):
+    h = L / n
+    x = -L/2
+    x_ade = [x]
+    for i in range(n + 1):
+        x = x + h
+        x_ade.append(x)
+    x = L/2
+    x_atr = [x]
+    for i in range(n):
+        x = x - h
+        x_atr.append(x)
+    x_atr.reverse()
+    return x_ade, x_atr
+
+def coeficientes_numerov(V_vec, h, E):
+    K_vec = E - V_vec
+    c0 = 1 + h**2 * K_vec / 12
+    c1 = 2 - 5 * h**2 * K_vec / 6
+    return K_vec, c0.tolist(), c1.tolist()
+
+def estacionario_vec(K_vec, L, n):
+    x_ade, x_atr = malla_numerov(L, n)
+    permitidos = np.flatnonzero(K_vec[:bisect_left(x_ade, L/2)] > 0)
+    if len(permitidos) == 0:
+        return L/2
+    elif permitidos[0] == 0:
+        return -L/2
+    else:
+        return x_ade[permitidos[0]] - L / n
+
+def indices_empate(p_est, L, n):
+    x_ade, x_atr = malla_numerov(L, n)
+    return bisect_right(x_ade, p_est) - 1, bisect_right(x_atr, p_est)
+
+# El punto de empate es el primer nodo con $E > V$, que solo puede ser un nodo donde el potencial alcanza un nuevo mínimo desde la izquierda (un cruce). `CrucesPotencial` guarda estos cruces ordenados por energía una sola vez por potencial, de manera que el empate se obtiene con una búsqueda binaria (`empate_vec`, para un vector de energías) en lugar de recorrer $E - V$ en toda la malla. En una búsqueda sobre energías vecinas, como la de `incremental`, `empate` parte del cruce de la energía anterior y solo avanza los cruces que quedan entre ambas energías.
+
+class CrucesPotencial:
+    __slots__ = ('L', 'n', 'x_ade', 'lim', 'umbrales', 'posiciones', 'cursor')
+
+    def __init__(self, V_vec, L, n):
+        self.L = L
+        self.n = n
+        self.x_ade = malla_numerov(L, n)[0]
+        self.lim = bisect_left(self.x_ade, L/2)
+        V_cota = np.minimum.accumulate(V_vec[:self.lim])
+        cruces = np.flatnonzero(V_vec[:self.lim] < np.concatenate([[np.inf], V_cota[:-1]])) # Nuevos mínimos
+        self.umbrales = V_vec[cruces][::-1].tolist() # Ascendentes en energía
+        self.posiciones = cruces[::-1].tolist()
+        self.cursor = 0 # Número de cruces por debajo de la última energía
+
+    def estacionario(self, j):
+        if j == self.lim:
+            return self.L/2
+        elif j == 0:
+            return -self.L/2
+        else:
+            return self.x_ade[j] - self.L / self.n
+
+    def empate(self, E):
+        m = self.cursor
+        while m < len(self.umbrales) and self.umbrales[m] < E:
+            m = m + 1
+        while m > 0 and self.umbrales[m - 1] >= E:
+            m = m - 1
+        self.cursor = m
+        return self.estacionario(self.posiciones[m - 1] if m > 0 else self.lim)
+
+    def empate_vec(self, E_vec):
+        m = np.searchsorted(self.umbrales, E_vec, side='left')
+        j = np.take(self.posiciones + [self.lim], m - 1) # Con m = 0 (ningún cruce por debajo) se toma lim
+        p_est = np.where(j == self.lim, self.L/2, np.take(self.x_ade, np.minimum(j, self.lim - 1)) - self.L / self.n)
+        return np.where(j == 0, -self.L/2, p_est)
+
+# Las amplitudes que propagan `numerov` y `Phi` (desde $\phi_1 = 10^{-10}$) crecen exponencialmente en las regiones prohibidas y, en intervalos amplios o colas profundas (como $x^4$ con $L = 40$), se desbordan y el residuo resulta indefinido. Como el residuo solo depende de cocientes, `numerov_vec` y `numerov_barrido` propagan en su lugar el cociente $s_i = \phi_{i-1}/\phi_i$ (Numerov renormalizado), que cumple
+# $$ s_{i+1} = \frac{c^{(0)}_{i+1}}{c^{(1)}_i - c^{(0)}_{i-1} s_i}, \qquad s_1 = 0, $$
+# y permanece acotado a cualquier profundidad. Con los cocientes $s_i$ de la izquierda y $s_d$ de la derecha en el punto de empate, el residuo de `numerov` es $(2 - s_i - s_d)/(s_d - s_i)$, sin la paridad $N$ ni el reescalamiento de la propagación derecha. `Phi_vec` guarda los cocientes y reconstruye la función de onda desde el punto de empate hacia las fronteras, con valor 1 en el empate para ambos lados, de manera que tampoco requiere reescalar. Los resultados coinciden con los de las amplitudes (hasta el redondeo) donde estas no se desbordan, con una operación menos por paso.
+
+def numerov_vec(V_vec, L, E, N, n, cruces = None):
+    p_est = estacionario_vec(E - V_vec, L, n) if cruces == None else cruces.empate(E)
+    i_ade, i_atr = indices_empate(p_est, L, n)
+    return nucleo_numerov(lote = False)(V_vec, L / n, np.array([E]), np.array([i_ade]), np.array([i_atr]), n)[0]
+
+def residuos_python(V_vec, h, E_vec, i_ade, i_atr, n):
+    residuos = []
+    for E, j_ade, j_atr in zip(E_vec.tolist(), i_ade.tolist(), i_atr.tolist()):
+        K_vec, c0, c1 = coeficientes_numerov(V_vec, h, E)
+        s_i = 0.0 # phi_0 / phi_1
+        for i in range(2, j_ade + 1):
+            s_i = c0[i + 1] / (c1[i] - c0[i - 1] * s_i)
+        s_d = 0.0 # phi_n / phi_(n-1)
+        for i in range(n - 2, j_atr - 1, -1):
+            s_d = c0[i - 1] / (c1[i] - c0[i + 1] * s_d)
+        residuos.append((2 - s_i - s_d) / (s_d - s_i)) # El residuo de numerov, dividido por phi_i_1
+    return residuos
+
+def Phi_vec(V_vec, L, E, N, n, cruces = None):
+    h = L / n
+    K_vec, c0, c1 = coeficientes_numerov(V_vec, h, E)
+    p_est = estacionario_vec(K_vec, L, n) if cruces == None else cruces.empate(E)
+    i_ade, i_atr = indices_empate(p_est, L, n)
+    s_g = [0.0]
+    for i in range(2, i_ade + 1):
+        s_g.append(c0[i + 1] / (c1[i] - c0[i - 1] * s_g[-1]))
+    s_gd = [0.0]
+    for i in range(n - 2, i_atr - 1, -1):
+        s_gd.append(c0[i - 1] / (c1[i] - c0[i + 1] * s_gd[-1]))
+    phi_g = [1.0] # Ambas propagaciones valen 1 en el punto de empate y decrecen hacia las fronteras
+    for s in reversed(s_g):
+        phi_g.append(s * phi_g[-1])
+    phi_g.reverse()
+    phi_gd = [1.0]
+    for s in reversed(s_gd):
+        phi_gd.append(s * phi_gd[-1])
+    phi_g.extend(phi_gd)
+    i_g = list(range(len(phi_g) - len(phi_gd))) + list(range(n + 1 - len(phi_gd), n + 1))
+    x_g = [-L/2 + i*h for i in i_g]
+    return x_g, phi_g
+
+
+# ### Barrido de energías en bloque
+# 
+# La búsqueda incremental avanza en pasos fijos $\Delta E$ y hace una propagación completa por cada paso, de forma secuencial. Como la recurrencia de Numerov es la misma para todas las energías, se puede propagar un vector de energías a la vez, avanzando nodo a nodo en la malla: cada energía se detiene en su propio punto de empate, y al final se obtiene la curva completa del residuo y todos los intervalos con cambio de signo en una sola pasada. El residuo no depende de la paridad $N$ (el valor inicial de la propagación desde la derecha solo cambia de signo, y el residuo depende de un cociente), de manera que un mismo barrido sirve para todos los niveles.
+# 
+# Las energías se procesan por bloques para limitar la memoria en barridos largos, como el caso anarmónico con $E_{max} = 325$ y $\Delta E = 10^{-4}$. La función `barrido` entrega la curva completa y todos los intervalos candidatos, mientras que `intervalos_barrido` los entrega bloque a bloque, de forma que `E_N` con `metodo = 'barrido'` no propaga energías por encima de la raíz buscada.
+
+# In[9]:
+
+def numerov_barrido(V_vec, L, E_vec, n):
+    h = L / n
+    E_vec = np.asarray(E_vec, dtype=float)
+    if perfil_activo != None:
+        perfil_activo.contar('energias_barrido', len(E_vec))
+    x_ade, x_atr = malla_numerov(L, n)
+    p_est = CrucesPotencial(V_vec, L, n).empate_vec(E_vec)
+    i_ade = np.searchsorted(x_ade, p_est, side='right') - 1
+    i_atr = np.searchsorted(x_atr, p_est, side='right')
+    return np.asarray(nucleo_numerov()(V_vec, h, E_vec, i_ade, i_atr, n), dtype=float)
+
+def residuos_numpy(V_vec, h, E_vec, i_ade, i_atr, n):
+    c0 = lambda i: 1 + h**2 * (E_vec - V_vec[i]) / 12
+    c1 = lambda i: 2 - 5 * h**2 * (E_vec - V_vec[i]) / 6
+    with np.errstate(all='ignore'):
+        s_i = np.zeros_like(E_vec)
+        for i in range(2, i_ade.max() + 1):
+            s_i = np.where(i <= i_ade, c0(i + 1) / (c1(i) - c0(i - 1) * s_i), s_i)
+        s_d = np.zeros_like(E_vec)
+        for i in range(n - 2, i_atr.min() - 1, -1):
+            s_d = np.where(i >= i_atr, c0(i - 1) / (c1(i) - c0(i + 1) * s_d), s_d)
+        return (2 - s_i - s_d) / (s_d - s_i)
+
+def barrido_bloques(V_vec, L, a, b, n, delta_x = 1e-4, bloque = 2**15, avance = None):
+    E_vec = a + delta_x * np.arange(int((b - a) / delta_x) + 1)
+    for i in range(0, max(len(E_vec) - 1, 1), bloque): # Con b - a < delta_x queda un bloque de un solo punto
+        E_bloque = E_vec[i:i + bloque + 1] # Cada bloque repite el último punto del anterior
+        residuos = numerov_barrido(V_vec, L, E_bloque, n)
+        if avance != None:
+            avance((E_bloque[-1] - a) / (b - a))
+        yield E_bloque, residuos
+
+def intervalos_barrido(V_vec, L, a, b, n, delta_x = 1e-4, bloque = 2**15, avance = None):
+    for E_bloque, residuos in barrido_bloques(V_vec, L, a, b, n, delta_x, bloque, avance):
+        for i in np.flatnonzero(~(residuos[:-1] * residuos[1:] > 0)): # Como en incremental, NaN cuenta como candidato
+            yield E_bloque[i], E_bloque[i + 1]
+
+def barrido(V_vec, L, a, b, n, delta_x = 1e-4, bloque = 2**15):
+    bloques = list(barrido_bloques(V_vec, L, a, b, n, delta_x, bloque))
+    E_vec = np.concatenate([bloques[0][0][:1]] + [E_bloque[1:] for E_bloque, residuos in bloques])
+    residuos = np.concatenate([bloques[0][1][:1]] + [residuos[1:] for E_bloque, residuos in bloques])
+    cambio = np.flatnonzero(~(residuos[:-1] * residuos[1:] > 0))
+    intervalos = [(E_vec[i], E_vec[i + 1]) for i in cambio]
+    return E_vec, residuos, intervalos
+
+def raiz_n_intervalos(funcion, intervalos, N, tol_x = 1e-6, refinar = biseccion):
+    cont_raiz = 0
+    for c in raices_intervalos(funcion, intervalos, tol_x, refinar):
+        cont_raiz = cont_raiz + 1
+        if cont_raiz == N:
+            return c
+    return None
+
+def raices_intervalos(funcion, intervalos, tol_x = 1e-6, refinar = biseccion):
+    for c0, c1 in intervalos:
+        c = refinar(funcion, c0, c1, tol_x)
+        if c != None: # Las discontinuidades se descartan igual que en incremental
+            yield c
+
+
+# ### Paso adaptativo de energía
+# 
+# El paso fijo $\Delta E = 10^{-4}$ es demasiado fino entre niveles muy separados y puede ser demasiado grueso para niveles casi degenerados (como en un pozo doble). Una estimación del número de niveles bajo $E$ la da la integral de fase semiclásica (WKB),
+# $$ \Phi(E) = \int_{V(x) < E} \sqrt{E - V(x)}\, dx \approx \left(N - \tfrac{1}{2}\right)\pi, $$
+# calculada sobre el potencial muestreado. La malla de energías se construye uniforme en la fase, con $\Phi(E_{k+1}) - \Phi(E_k) = \pi / f$, de forma que se tienen del orden de $f$ (factor de seguridad) evaluaciones entre niveles sucesivos, con pasos grandes donde la densidad de niveles es baja. El paso se limita entre $\Delta E_{min}$ y $\Delta E_{max}$.
+# 
+# Como la estimación WKB describe la densidad media de niveles y no los desdoblamientos por efecto túnel, cada paso se verifica con el conteo de nodos (teorema de oscilación): si el número de nodos aumenta en dos o más dentro de un paso, el paso se subdivide hasta separarlos, con diez veces la tolerancia de la raíz como límite (los desdoblamientos por efecto túnel pueden ser mucho menores que $\Delta E_{min}$). Esto separa los niveles del conteo, pero no garantiza que el residuo de `numerov` los separe: sus raíces están desplazadas del conteo en el orden de la discretización, y en un par casi degenerado puede tener un solo cambio de signo (en el pozo doble $(x^2 - 9)^2/4$ con $L = 12$ y $n = 400$, los pares desdoblados en $10^{-6}$ y $1.7 \times 10^{-4}$ dan una sola raíz cada uno, aun con pasos de $10^{-8}$). En ese caso el espectro queda incompleto, y `advertir_niveles` lo señala con un `RuntimeWarning` cuando el conteo de nodos bajo la energía alcanzada supera el número de raíces halladas (al final de `niveles_Schr`, o para el nivel $N$ en `E_N`). Si aumenta en uno sin que el residuo cambie de signo (la raíz y una discontinuidad cercana se cancelan), el paso se subdivide una vez; como el conteo de nodos y el residuo del disparo difieren en el orden de la discretización, el nivel puede aparecer en el paso vecino, de manera que también se subdividen los vecinos, y no se insiste más allá.
+
+# In[10]:
+
+def fase_wkb(V_vec, L, E_vec, n):
+    h = L / n
+    E_vec = np.asarray(E_vec, dtype=float)
+    return np.concatenate([h * np.sqrt(np.maximum(E_vec[i:i + 256, None] - V_vec[None, :n + 1], 0)).sum(axis=1)
+                           for i in range(0, len(E_vec), 256)])
+
+def malla_wkb(V_vec, L, a, b, n, factor = 8, delta_min = 1e-4, delta_max = None, muestras = 2048):
+    delta_max = delta_max or (b - a) / 16
+    E_fino = np.linspace(a, b, muestras)
+    fase = fase_wkb(V_vec, L, E_fino, n)
+    E_vec = [a]
+    while E_vec[-1] < b:
+        objetivo = np.interp(E_vec[-1], E_fino, fase) + np.pi / factor
+        E_sig = np.interp(objetivo, fase, E_fino) if objetivo <= fase[-1] else b
+        E_vec.append(min(b, E_vec[-1] + min(max(E_sig - E_vec[-1], delta_min), delta_max)))
+    return np.array(E_vec)
+
+def nodos_barrido(V_vec, L, E_vec, n):
+    h = L / n
+    E_vec = np.asarray(E_vec, dtype=float)
+    c0 = lambda i: 1 + h**2 * (E_vec - V_vec[i]) / 12
+    c1 = lambda i: 2 - 5 * h**2 * (E_vec - V_vec[i]) / 6
+    phi0 = np.zeros_like(E_vec)
+    phi1 = np.full_like(E_vec, 1e-10)
+    nodos = np.zeros(len(E_vec), dtype=int)
+    for i in range(1, n):
+        phi0, phi1 = phi1, (c1(i) * phi1 - c0(i - 1) * phi0) / c0(i + 1)
+        nodos = nodos + (phi0 * phi1 < 0)
+        grande = np.abs(phi1) > 1e100 # Renormalización, solo interesa el signo
+        phi0 = np.where(grande, phi0 * 1e-100, phi0)
+        phi1 = np.where(grande, phi1 * 1e-100, phi1)
+    return nodos
+
+def intervalos_malla(V_vec, L, mallas, n, factor, delta_min, delta_doble):
+    if len(mallas) == 0:
+        return []
+    E_todo = np.concatenate([E_vec for E_vec, verificar_nivel in mallas]) # Todas las mallas en un solo barrido
+    residuos = numerov_barrido(V_vec, L, E_todo, n)
+    nodos = nodos_barrido(V_vec, L, E_todo, n)
+    planes = []
+    submallas = []
+    inicio = 0
+    for E_vec, verificar_nivel in mallas:
+        r = residuos[inicio:inicio + len(E_vec)]
+        niveles = np.diff(nodos[inicio:inicio + len(E_vec)])
+        inicio = inicio + len(E_vec)
+        cambio = ~(r[:-1] * r[1:] > 0) # Como en incremental, NaN cuenta como candidato
+        subdividir = niveles >= 2 # Niveles casi degenerados
+        if verificar_nivel: # Un nivel cuyo cambio de signo se cancela con una discontinuidad, aquí o en un paso vecino
+            perdido = (niveles == 1) & ~cambio
+            subdividir = subdividir | perdido | np.append(perdido[1:], False) | np.insert(perdido[:-1], 0, False)
+        plan = []
+        for k in range(len(E_vec) - 1):
+            if subdividir[k] and E_vec[k + 1] - E_vec[k] > (delta_doble if niveles[k] >= 2 else delta_min):
+                pasos = max(2, min(int((E_vec[k + 1] - E_vec[k]) / delta_min), factor * max(niveles[k], 1)))
+                plan.append(len(submallas))
+                submallas.append((np.linspace(E_vec[k], E_vec[k + 1], pasos + 1), niveles[k] >= 2))
+            elif cambio[k]:
+                plan.append((E_vec[k], E_vec[k + 1]))
+        planes.append(plan)
+    sub_intervalos = intervalos_malla(V_vec, L, submallas, n, factor, delta_min, delta_doble)
+    return [[intervalo for paso in plan for intervalo in (sub_intervalos[paso] if isinstance(paso, int) else [paso])]
+            for plan in planes]
+
+def intervalos_adaptativos(V_vec, L, a, b, n, delta_x = 1e-4, factor = 8, delta_max = None, tol_x = 1e-6):
+    E_vec = malla_wkb(V_vec, L, a, b, n, factor, delta_x, delta_max)
+    with np.errstate(all='ignore'):
+        return iter(intervalos_malla(V_vec, L, [(E_vec, True)], n, factor, delta_x, 10 * tol_x)[0])
+
+def advertir_niveles(V_vec, L, E, n, encontrados): # Raíces del residuo halladas bajo E, frente al conteo de nodos
+    esperados = nodos_vec(V_vec, L, E, n)
+    if esperados > encontrados:
+        warnings.warn('El conteo de nodos tiene ' + str(esperados) + ' niveles bajo E = ' + '%.6g' % E + ' y el residuo solo ' +
+                      str(encontrados) + ': hay niveles casi degenerados que el residuo no separa', RuntimeWarning)
+
+
+# ### Conteo de nodos
+# 
+# Para hallar el nivel $N$, `raiz_n` encuentra en orden todas las raíces anteriores, de manera que el costo crece con $N$. Por el teorema de oscilación de Sturm, el número de nodos de la solución propagada desde la frontera izquierda a lo largo de todo el intervalo, con energía $E$, es igual al número de autovalores menores que $E$. Así, el autoestado $N$ (con $N-1$ nodos) se aísla directamente con una bisección sobre el conteo de nodos: se busca un intervalo $[E_a, E_b]$ con $N-1$ nodos en $E_a$ y $N$ nodos en $E_b$.
+# 
+# El conteo es monótono en la energía, de manera que la bisección sobre él no encuentra las discontinuidades con cambio de signo de la función del disparo (ni raíces espurias de esta), y no requiere la verificación con `factor_ty` de `biseccion`. La propagación usa el esquema de Numerov centrado en cada nodo, $y_{i+1} c^{(0)}_{i+1} = c^{(1)}_i y_i - c^{(0)}_{i-1} y_{i-1}$, y se renormaliza cuando la amplitud crece demasiado en las regiones prohibidas, ya que solo interesa el signo. El autovalor del conteo corresponde al problema con $\psi(\pm L/2) = 0$ sobre la malla, y difiere del cero del residuo de `numerov` en el orden de la discretización (para el oscilador armónico con $n = 300$ se obtiene $E_1 = 0.5000$ frente a $0.4911$). Para que `E_N` entregue la misma energía con todas las estrategias, con `metodo = 'nodos'` el conteo solo ubica el nivel: `intervalos_cercanos` busca los cambios de signo del residuo alrededor del valor del conteo, en ventanas de ancho creciente con paso `delta_x`, y los entrega del más cercano al más lejano; se refina con `refinar` el primero cuya raíz tenga $N - 1$ o $N$ nodos (es decir, que quede entre los niveles vecinos del conteo) y esté más cerca del nivel $N$ que del otro nivel del conteo junto a ella, de manera que cada raíz se asigna a un solo nivel. Cuando el residuo no separa un par de niveles casi degenerados (con un solo cambio de signo para ambos, como en el pozo doble $(x^2 - 9)^2/4$ con $L = 12$ y $n = 400$), la raíz queda con uno de los dos niveles y el otro no se encuentra (`None`), igual que con el `barrido`, aunque no necesariamente el mismo: el `barrido` asigna la raíz al nivel que le corresponde por su orden, y el conteo al más cercano.
+
+# In[11]:
+
+def nodos_vec(V_vec, L, E, n):
+    if perfil_activo != None:
+        perfil_activo.contar('conteos_nodos')
+    h = L / n
+    K_vec, c0, c1 = coeficientes_numerov(V_vec, h, E)
+    phi0 = 0.0
+    phi1 = 1e-10
+    nodos = 0
+    for i in range(1, n):
+        phi0, phi1 = phi1, (c1[i] * phi1 - c0[i - 1] * phi0) / c0[i + 1]
+        if phi0 * phi1 < 0:
+            nodos = nodos + 1
+        if abs(phi1) > 1e100: # Renormalización, solo interesa el signo
+            phi0 = phi0 * 1e-100
+            phi1 = phi1 * 1e-100
+    return nodos
+
+def intervalo_nodos(V_vec, L, a, b, N, n, tol_x = 1e-6):
+    if nodos_vec(V_vec, L, b, n) < N or nodos_vec(V_vec, L, a, n) >= N: # El nivel N no esta en [a, b]
+        return None
+    while abs(b - a) >= tol_x:
+        c = (a + b) / 2.0
+        if nodos_vec(V_vec, L, c, n) >= N:
+            b = c
+        else:
+            a = c
+    return a, b
+
+def intervalos_cercanos(V_vec, L, E, a, b, n, delta_x = 1e-4, primero = 16):
+    k_a, k_b = -int((E - a) / delta_x), int((b - E) / delta_x) # Malla E + k delta_x, limitada a [a, b]
+    i, j = 0, 0
+    ancho = primero
+    while i > k_a or j < k_b:
+        nuevos = []
+        for k0, k1 in ((max(-ancho, k_a), i), (j, min(ancho, k_b))): # Solo las partes nuevas de la ventana
+            if k1 > k0:
+                E_vec = E + delta_x * np.arange(k0, k1 + 1)
+                residuos = numerov_barrido(V_vec, L, E_vec, n)
+                nuevos.extend((E_vec[m], E_vec[m + 1]) for m in np.flatnonzero(~(residuos[:-1] * residuos[1:] > 0)))
+        i, j = max(-ancho, k_a), min(ancho, k_b)
+        ancho = 2 * ancho
+        for intervalo in sorted(nuevos, key = lambda c: abs(c[0] + c[1] - 2 * E)):
+            yield intervalo
+
+class ConteoNiveles: # Autovalores del conteo en [a, b], calculados a medida que se piden
+    def __init__(self, V_vec, L, a, b, n, tol_x = 1e-6):
+        self.V_vec = V_vec
+        self.L = L
+        self.a = a
+        self.b = b
+        self.n = n
+        self.tol_x = tol_x
+        self.niveles = {}
+
+    def nivel(self, M): # None si el nivel M no esta en [a, b]
+        if M not in self.niveles:
+            intervalo = intervalo_nodos(self.V_vec, self.L, self.a, self.b, M, self.n, self.tol_x) if M > 0 else None
+            self.niveles[M] = None if intervalo == None else (intervalo[0] + intervalo[1]) / 2.0
+        return self.niveles[M]
+
+    def asignado(self, E, N): # Si la raíz E del residuo corresponde al nivel N
+        if self.nivel(N) == None:
+            return False
+        nodos = nodos_vec(self.V_vec, self.L, E, self.n)
+        if nodos not in (N - 1, N): # Fuera de los niveles vecinos del conteo
+            return False
+        E_vecino = self.nivel(N - 1 if nodos == N - 1 else N + 1) # El otro nivel junto a la raíz
+        return E_vecino == None or abs(E - self.nivel(N)) < abs(E - E_vecino)
+
+def raiz_conteo(funcion, V_vec, L, N, n, conteo, a, b, delta_x = 1e-4, tol_x = 1e-6, refinar = biseccion):
+    if conteo.nivel(N) == None:
+        return None
+    def refinar_nivel(funcion, c0, c1, tol_x): # Solo la raíz que el conteo asigna al nivel N
+        c = refinar(funcion, c0, c1, tol_x)
+        return c if c != None and conteo.asignado(c, N) else None
+    intervalos = intervalos_cercanos(V_vec, L, conteo.nivel(N), a, b, n, delta_x) # La más cercana al nivel del conteo
+    return raiz_n_intervalos(funcion, intervalos, 1, tol_x, refinar_nivel)
+
+
+# ### Diferencias finitas
+# 
+# Como alternativa al método del disparo, la ecuación de Schrödinger sobre la misma malla de `discretizar` se puede escribir con la segunda derivada en diferencias finitas centradas, $\psi''(x_i) \approx (\psi_{i+1} - 2\psi_i + \psi_{i-1})/h^2$. Con $\psi_0 = \psi_n = 0$ en las fronteras, el problema queda como el de autovalores de una matriz simétrica tridiagonal de orden $n-1$,
+# $$ H_{ii} = \frac{2}{h^2} + V_i, \qquad H_{i,i\pm1} = -\frac{1}{h^2}, $$
+# de la cual se obtienen en una sola llamada todos los autovalores menores que $E_{max}$, y los autovectores solo para los niveles solicitados. A diferencia del disparo, no requiere búsqueda de raíces ni presenta discontinuidades; su error es de segundo orden en $h$. Se usa `scipy.linalg.eigh_tridiagonal` cuando está disponible, y en caso contrario la diagonalización densa de `numpy`.
+
+# In[12]:
+
+def hamiltoniano_tridiagonal(V_vec, L, n):
+    h = L / n
+    diagonal = 2 / h**2 + V_vec[1:n]
+    fuera = np.full(n - 2, -1 / h**2)
+    return diagonal, fuera
+
+@lru_cache(maxsize=None)
+def cargar_eigh_tridiagonal(): # scipy se importa solo al usarse, por su costo de importación
+    try:
+        from scipy.linalg import eigh_tridiagonal
+    except ImportError: # Sin scipy se usa la diagonalización densa de numpy
+        return None
+    return eigh_tridiagonal
+
+def espectro_tridiagonal(V_vec, E_max, L, n, niveles = ()):
+    eigh_tridiagonal = cargar_eigh_tridiagonal()
+    h = L / n
+    diagonal, fuera = hamiltoniano_tridiagonal(V_vec, L, n)
+    if eigh_tridiagonal != None:
+        E_vec = eigh_tridiagonal(diagonal, fuera, eigvals_only = True, select = 'v',
+                                 select_range = (diagonal.min() - 2 / h**2 - 1, E_max))
+        niveles = [N for N in niveles if N <= len(E_vec)]
+        vectores = []
+        if len(niveles) > 0:
+            E_sel, vectores = eigh_tridiagonal(diagonal, fuera, select = 'i',
+                                               select_range = (min(niveles) - 1, max(niveles) - 1))
+            vectores = [vectores[:, N - min(niveles)] for N in niveles]
+    else:
+        E_vec, vectores = np.linalg.eigh(np.diag(diagonal) + np.diag(fuera, 1) + np.diag(fuera, -1))
+        E_vec = E_vec[E_vec <= E_max]
+        niveles = [N for N in niveles if N <= len(E_vec)]
+        vectores = [vectores[:, N - 1] for N in niveles]
+    x_vec = [-L/2 + i*h for i in range(n + 1)]
+    estados = []
+    for vector in vectores:
+        if vector[np.argmax(np.abs(vector) > 1e-8 * np.abs(vector).max())] < 0: # Signo como en Phi, positivo a la izquierda
+            vector = -vector
+        estados.append((x_vec, [0.0] + vector.tolist() + [0.0]))
+    return E_vec, estados
+
+
 # Para la ecuación de Schrödinger, $K(x) = E - V(x)$.  
 
-# In[16]:
+# In[13]:
 
 def K_Schr(V_0, a):
+    from vis_int import potencial
     return lambda e, x: e - potencial(V_0, a, x)
 
 
-
 # Para ilustrar el método del disparo, se presenta el siguiente control. La idea es ajustar para una configuración de potencial $V_0$, ancho $a$, longitud total $L$ y numero de elementos de discretización $n$, la energía $E$ adecuada para observar continuidad en la función de onda y su derivada en todo el intervalo.  
 
-# In[18]:
+# In[14]:
 
 def disparo(V_0, a,  L, n, N, E):
+    from vis_int import potencial, graficar_potencial, graficar_autofuncion, graficar_autovalor, plt
     x, phi = Phi(K_Schr(V_0, a), L, E, N, n)
     V = [potencial(V_0, a, i) for i in x]
     graficar_potencial(x, V)
@@ -319,34 +890,499 @@ def presion_disparo(boton):
 
 # La anterior ilustración tambien permite observar los efectos del potencial sobre un paquete de onda cuando la energía es menor o mayor que el potencial. Se puede observar como para $E>V_0$, se obtiene una función de onda oscilante en todo el intervalo, equivalente a una particula libre.  
 
-def E_N(K, E_max, L, N, n, delta_e = 1e-4, tol_e = 1e-6):
-    Numerov = lambda e: numerov(K, L, e, N, n)
-    return raiz_n(Numerov, tol_e, E_max, N, delta_e, tol_e)
+# ### Potenciales ingresados como texto
+# 
+# Para el potencial arbitrario ingresado como texto, evaluar la cadena con `eval` en cada punto de la malla, para cada energía de prueba, repite el análisis de la expresión miles de veces y además permite ejecutar código arbitrario. La función `compilar_potencial` analiza la expresión una sola vez, verifica que solo contenga números, la variable `x`, operaciones aritméticas y las funciones de `math` que reexporta `vis_int` (`sin`, `cos`, `tan`, `sqrt`, `log`, `exp` y la constante `pi`, además de `abs`), y la compila sobre las funciones equivalentes de `numpy`, de forma que se evalúa en toda la malla en una sola llamada. Cada función recibe exactamente un argumento posicional (con un segundo, `numpy` escribiría el resultado sobre él, por ejemplo sobre la malla), y las constantes se convierten a punto flotante antes de compilar, ya que una potencia de enteros como `9**9**9**9` se calcula con enteros de precisión arbitraria y no termina; en punto flotante se desborda de inmediato. La expresión se evalúa una vez al compilarla, de manera que estos errores (y, por ejemplo, `1 % 0`) se reportan como `ValueError`, igual que una expresión no permitida. Las expresiones compiladas se guardan por su texto.
+
+# In[15]:
+
+funciones_potencial = {'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'sqrt': np.sqrt,
+                       'log': np.log, 'exp': np.exp, 'abs': np.abs, 'pi': np.pi}
+
+nodos_permitidos = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant, ast.Load,
+                    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.UAdd, ast.USub)
+
+def validar_potencial(arbol):
+    funciones = set()
+    for nodo in ast.walk(arbol):
+        if not isinstance(nodo, nodos_permitidos):
+            raise ValueError('Expresión no permitida en el potencial: ' + type(nodo).__name__)
+        if isinstance(nodo, ast.Constant) and (isinstance(nodo.value, bool) or not isinstance(nodo.value, (int, float))):
+            raise ValueError('Constante no permitida en el potencial: ' + repr(nodo.value))
+        if isinstance(nodo, ast.Name) and nodo.id != 'x' and nodo.id not in funciones_potencial:
+            raise ValueError('Nombre no permitido en el potencial: ' + nodo.id)
+        if isinstance(nodo, ast.Call): # Un solo argumento posicional: numpy toma el segundo como salida (out)
+            if not isinstance(nodo.func, ast.Name) or nodo.func.id in ('x', 'pi') or len(nodo.args) != 1 or nodo.keywords:
+                raise ValueError('Llamado no permitido en el potencial: ' + ast.unparse(nodo))
+            funciones.add(nodo.func)
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.Name) and nodo.id not in ('x', 'pi') and nodo not in funciones:
+            raise ValueError('Función sin argumento en el potencial: ' + nodo.id)
+
+def flotantes_potencial(arbol): # Las potencias de enteros (9**9**9**9) no terminan; en punto flotante se desbordan
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.Constant):
+            try:
+                nodo.value = float(nodo.value)
+            except OverflowError:
+                raise ValueError('Constante fuera de rango en el potencial: ' + repr(nodo.value))
+    return arbol
+
+@lru_cache(maxsize=128)
+def compilar_potencial(texto):
+    arbol = ast.parse(texto.strip(), mode='eval')
+    validar_potencial(arbol)
+    codigo = compile(flotantes_potencial(arbol), '<potencial>', 'eval')
+    def Vx(x):
+        x = np.asarray(x, dtype=float)
+        with np.errstate(all='ignore'):
+            V = eval(codigo, {'__builtins__': {}}, dict(funciones_potencial, x=x))
+        return V + np.zeros_like(x) if x.ndim > 0 else float(V) # Las constantes se extienden a la malla
+    try: # Los términos sin x se evalúan con floats de python, que fallan en lugar de dar inf o nan
+        Vx(np.zeros(1))
+    except (ArithmeticError, TypeError) as error:
+        raise ValueError('El potencial no se puede evaluar: ' + str(error))
+    Vx.vectorizada = True
+    Vx.texto = texto
+    return Vx
+
+
+# ### Perfil de ejecución
+# 
+# Para saber en qué se va el tiempo de una solución (el muestreo del potencial, el barrido de energías, el refinamiento de los intervalos, la reconstrucción de la función de onda o las gráficas), `Solve_Schr` y `E_N` se pueden ejecutar dentro de un `Perfil`:
+# 
+#     with Perfil() as perfil:
+#         Solve_Schr(Vx, E_max, L, N, n)
+#     perfil.reporte()
+# 
+# El perfil acumula el tiempo de cada etapa, cuenta las propagaciones de Numerov, las evaluaciones del potencial, las energías propagadas en bloque, los conteos de nodos y los aciertos de la cache, y registra cada intervalo refinado (extremos, raíz o discontinuidad y evaluaciones). El tiempo del barrido es el de `E_N` menos el del refinamiento. Sin un perfil activo cada punto de medición solo compara `perfil_activo` con `None`, y las funciones de la búsqueda no se envuelven. Las búsquedas con `metodo = 'paralelo'` refinan en otros procesos, de manera que su refinamiento no se registra.
+
+# In[16]:
+
+perfil_activo = None
+sin_perfil = nullcontext()
+
+class Etapa:
+    def __init__(self, perfil, nombre):
+        self.perfil = perfil
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = perf_counter()
+
+    def __exit__(self, *error):
+        self.perfil.sumar(self.nombre, perf_counter() - self.inicio)
+
+def etapa(nombre):
+    return sin_perfil if perfil_activo == None else Etapa(perfil_activo, nombre)
+
+class Perfil:
+    def __init__(self):
+        self.tiempos = OrderedDict()
+        self.contadores = OrderedDict()
+        self.intervalos = []
+        self.anterior = None
+
+    def __enter__(self):
+        global perfil_activo
+        self.anterior = perfil_activo
+        perfil_activo = self
+        self.inicio = perf_counter()
+        return self
+
+    def __exit__(self, *error):
+        global perfil_activo
+        self.sumar('total', perf_counter() - self.inicio)
+        perfil_activo = self.anterior
+
+    def sumar(self, nombre, tiempo):
+        self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + tiempo
+
+    def contar(self, nombre, cantidad = 1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def contado(self, nombre, funcion):
+        def funcion_contada(*args):
+            self.contar(nombre)
+            return funcion(*args)
+        return funcion_contada
+
+    def refinamiento(self, refinar):
+        def refinar_perfil(funcion, a, b, tol_x = 1e-6):
+            contador = Contador(funcion)
+            inicio = perf_counter()
+            c = refinar(contador, a, b, tol_x)
+            self.sumar('refinamiento', perf_counter() - inicio)
+            self.intervalos.append({'a': float(a), 'b': float(b), 'raiz': None if c == None else float(c),
+                                    'evaluaciones': contador.evaluaciones})
+            return c
+        refinar_perfil.__name__ = refinar.__name__
+        return refinar_perfil
+
+    def reporte(self):
+        tiempos = dict(self.tiempos)
+        if 'E_N' in tiempos:
+            tiempos['barrido'] = tiempos['E_N'] - tiempos.get('refinamiento', 0.0)
+        raices = len([intervalo for intervalo in self.intervalos if intervalo['raiz'] != None])
+        evaluaciones = sum([intervalo['evaluaciones'] for intervalo in self.intervalos])
+        return {'tiempos': tiempos, 'contadores': dict(self.contadores),
+                'intervalos': {'candidatos': len(self.intervalos), 'raices': raices,
+                               'discontinuidades': len(self.intervalos) - raices, 'evaluaciones': evaluaciones,
+                               'evaluaciones_por_intervalo': evaluaciones / len(self.intervalos) if self.intervalos else 0.0,
+                               'detalle': list(self.intervalos)}}
+
+
+# ### Búsqueda paralela por ventanas de energía
+# 
+# El barrido y el refinamiento de las raíces son independientes entre intervalos de energía distintos, de manera que el intervalo $[0, E_{max}]$ (relativo al mínimo del potencial) se divide en ventanas que se procesan en paralelo en un conjunto de procesos. Las ventanas comparten sus extremos sobre la misma malla de energías del `barrido`, de forma que ningún paso queda por fuera; una raíz que cae justo sobre un extremo compartido la encuentran las dos ventanas vecinas, y al unir los resultados en orden se conserva una sola. El potencial muestreado se envía una sola vez a cada proceso al crear el conjunto (`BusquedaParalela`), y cada tarea solo recibe los límites de su ventana. `raices_paralelo` (y así `E_N` con `metodo = 'paralelo'`) conserva el último conjunto y lo reutiliza mientras no cambien la muestra, $L$, $n$ ni el número de procesos, de manera que las soluciones repetidas sobre el mismo potencial (como los botones de los controles) no vuelven a crear los procesos; con otro potencial el conjunto anterior se cierra, y `cerrar_paralelo` lo libera explícitamente. Las búsquedas se hacen una a la vez (bajo `candado_paralelo`), ya que cada una ocupa todos los procesos. Para hallar el nivel $N$ se buscan todas las raíces hasta $E_{max}$, ya que no se sabe de antemano en qué ventana está.
+
+# In[17]:
+
+potencial_trabajador = None
+
+def iniciar_trabajador(V_vec, L, n):
+    global potencial_trabajador
+    potencial_trabajador = (V_vec, L, n, CrucesPotencial(V_vec, L, n))
+
+def raices_ventana(a, i, j, delta_e, tol_e, refinar):
+    V_vec, L, n, cruces = potencial_trabajador
+    Numerov = lambda e: numerov_vec(V_vec, L, e, 1, n, cruces)
+    E_vec = a + delta_e * np.arange(i, j + 1) # Los mismos puntos de la malla global
+    raices = []
+    with np.errstate(all='ignore'):
+        residuos = numerov_barrido(V_vec, L, E_vec, n)
+        for k in np.flatnonzero(~(residuos[:-1] * residuos[1:] > 0)):
+            c = refinar(Numerov, E_vec[k], E_vec[k + 1], tol_e)
+            if c != None:
+                raices.append(c)
+    return raices
+
+class BusquedaParalela:
+    def __init__(self, V_vec, L, n, procesos = None):
+        self.L = L
+        self.n = n
+        self.procesos = procesos or os.cpu_count()
+        self.llave = (huella_muestra(V_vec), L, n, self.procesos)
+        self.pool = ProcessPoolExecutor(self.procesos, initializer = iniciar_trabajador, initargs = (V_vec, L, n))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        self.cerrar()
+
+    def cerrar(self):
+        self.pool.shutdown()
+
+    def raices(self, a, b, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, ventanas = None, bloque = 2**15):
+        pasos = int((b - a) / delta_e)
+        ventanas = ventanas or max(4 * self.procesos, pasos // bloque + 1)
+        cortes = sorted(set(np.linspace(0, pasos, ventanas + 1).round().astype(int).tolist()))
+        tareas = [self.pool.submit(raices_ventana, a, i, j, delta_e, tol_e, refinar) for i, j in zip(cortes[:-1], cortes[1:])]
+        raices = []
+        for i, tarea in zip(cortes[:-1], tareas):
+            raices_v = tarea.result()
+            frontera = a + delta_e * i
+            if raices and raices_v and abs(raices[-1] - frontera) <= tol_e and abs(raices_v[0] - frontera) <= tol_e:
+                raices_v = raices_v[1:] # La misma raíz, sobre el extremo compartido por las dos ventanas
+            raices.extend(raices_v)
+        return raices
+
+busqueda_activa = None # La última BusquedaParalela, que se reutiliza mientras no cambie la muestra
+candado_paralelo = RLock()
+
+def busqueda_paralela(V_vec, L, n, procesos = None):
+    global busqueda_activa
+    llave = (huella_muestra(V_vec), L, n, procesos or os.cpu_count())
+    if busqueda_activa == None or busqueda_activa.llave != llave:
+        cerrar_paralelo()
+        busqueda_activa = BusquedaParalela(V_vec, L, n, procesos)
+    return busqueda_activa
+
+def cerrar_paralelo():
+    global busqueda_activa
+    with candado_paralelo:
+        if busqueda_activa != None:
+            busqueda_activa.cerrar()
+            busqueda_activa = None
+
+def raices_paralelo(V_vec, L, a, b, n, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, procesos = None, ventanas = None):
+    with candado_paralelo: # Una búsqueda a la vez, ya que cada una ocupa todos los procesos
+        return busqueda_paralela(V_vec, L, n, procesos).raices(a, b, delta_e, tol_e, refinar, ventanas)
+
+
+# ### Cache de autoestados
+# 
+# Cada interacción con los controles vuelve a resolver el problema desde cero, aun cuando los parámetros no han cambiado. Como las funciones del potencial son usualmente `lambda` construidas en cada llamado (por ejemplo `lambda x: V_fin(V_max, a, x)`), no se pueden usar como llave; en su lugar la llave es una huella (`sha1`) de los valores muestreados del potencial junto con $(L, n, N)$ y las tolerancias. La cache se limita por número de entradas y por tamaño total en bytes, descartando primero las entradas usadas hace más tiempo (LRU), y registra los aciertos y fallos. Como cada control resuelve en su propio hilo (`SolucionFondo`), las operaciones de la cache se hacen bajo un candado (`threading.RLock`), de manera que el reemplazo, la inserción, el descarte y la cuenta de bytes no se intercalan entre hilos.
+
+# In[18]:
+
+def tamano_bytes(valor):
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    elif isinstance(valor, (list, tuple)):
+        return sum([tamano_bytes(i) for i in valor]) + 8 * len(valor)
+    else:
+        return 32
+
+class CacheAutoestados:
+    def __init__(self, max_entradas = 128, max_bytes = 64 * 2**20):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.entradas = OrderedDict()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.candado = RLock() # Los controles resuelven en hilos aparte, cada uno con su ejecutor
+
+    def clave(self, V_muestra, *parametros):
+        if isinstance(V_muestra, PotencialMuestreado):
+            return (V_muestra.huella(), parametros)
+        return (huella_muestra(V_muestra), parametros)
+
+    def obtener(self, clave):
+        with self.candado:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                self.aciertos = self.aciertos + 1
+                if perfil_activo != None:
+                    perfil_activo.contar('cache_aciertos')
+                return True, self.entradas[clave][0]
+            self.fallos = self.fallos + 1
+        if perfil_activo != None:
+            perfil_activo.contar('cache_fallos')
+        return False, None
+
+    def guardar(self, clave, valor):
+        tamano = tamano_bytes(valor)
+        with self.candado: # Reemplazo, inserción y descarte como una sola operación
+            self.invalidar(clave)
+            if tamano > self.max_bytes:
+                return
+            self.entradas[clave] = (valor, tamano)
+            self.bytes = self.bytes + tamano
+            while len(self.entradas) > self.max_entradas or self.bytes > self.max_bytes:
+                clave_vieja, (valor_viejo, tamano_viejo) = self.entradas.popitem(last=False)
+                self.bytes = self.bytes - tamano_viejo
+
+    def invalidar(self, clave = None):
+        with self.candado:
+            if clave == None: # Sin llave se vacía toda la cache
+                self.entradas.clear()
+                self.bytes = 0
+            elif clave in self.entradas:
+                self.bytes = self.bytes - self.entradas.pop(clave)[1]
+
+    def estadisticas(self):
+        with self.candado:
+            consultas = self.aciertos + self.fallos
+            return {'aciertos': self.aciertos, 'fallos': self.fallos,
+                    'tasa_aciertos': self.aciertos / consultas if consultas > 0 else 0.0,
+                    'entradas': len(self.entradas), 'bytes': self.bytes}
+
+cache_autoestados = CacheAutoestados()
+
+def E_N(K, E_max, L, N, n, delta_e = 1e-4, tol_e = 1e-6, propagador = None, metodo = 'incremental', usar_cache = True, refinar = biseccion, avance = None):
+    if propagador == None: # numerov evalúa K(E, x), numerov_vec usa la muestra del potencial
+        propagador = numerov_vec if isinstance(K, np.ndarray) else numerov
+    if usar_cache and isinstance(K, np.ndarray): # Solo un potencial muestreado tiene huella
+        clave = cache_autoestados.clave(K, 'E_N', E_max, L, N, n, delta_e, tol_e, propagador.__name__, metodo, refinar.__name__)
+        encontrado, E = cache_autoestados.obtener(clave)
+        if not encontrado:
+            E = E_N(K, E_max, L, N, n, delta_e, tol_e, propagador, metodo, False, refinar, avance)
+            cache_autoestados.guardar(clave, E)
+        return E
+    with etapa('E_N'):
+        return buscar_autovalor(K, E_max, L, N, n, delta_e, tol_e, propagador, metodo, refinar, avance)
+
+def funcion_avance(funcion, avance, a, b):
+    def funcion_con_avance(e):
+        avance(min(max((e - a) / (b - a), 0.0), 1.0))
+        return funcion(e)
+    return funcion_con_avance
+
+def buscar_autovalor(K, E_max, L, N, n, delta_e, tol_e, propagador, metodo, refinar, avance = None):
+    if perfil_activo != None and not isinstance(K, np.ndarray): # K(E, x) evalúa el potencial en cada llamado
+        K = perfil_activo.contado('potencial', K)
+    if isinstance(K, np.ndarray): # Un solo índice de cruces para todas las energías de la búsqueda
+        cruces = CrucesPotencial(K, L, n)
+        Numerov = lambda e: propagador(K, L, e, N, n, cruces)
+    else:
+        Numerov = lambda e: propagador(K, L, e, N, n)
+    if perfil_activo != None:
+        Numerov = perfil_activo.contado('numerov', Numerov)
+        if metodo != 'paralelo': # El refinamiento se envía a otros procesos, y el envuelto no se puede serializar
+            refinar = perfil_activo.refinamiento(refinar)
+    if avance != None: # Fracción del intervalo de energía ya evaluada
+        Numerov = funcion_avance(Numerov, avance, tol_e, E_max)
+    if metodo == 'barrido': # Requiere K como potencial muestreado (ver numerov_vec)
+        intervalos = intervalos_barrido(K, L, tol_e, E_max, n, delta_e, avance = avance) # Se detiene al hallar la raíz N
+        return raiz_n_intervalos(Numerov, intervalos, N, tol_e, refinar)
+    if metodo == 'adaptativo': # Requiere K como potencial muestreado, delta_e es el paso mínimo
+        intervalos = intervalos_adaptativos(K, L, tol_e, E_max, n, delta_e, tol_x = tol_e)
+        E = raiz_n_intervalos(Numerov, intervalos, N, tol_e, refinar)
+        advertir_niveles(K, L, E_max if E == None else E, n, N - 1 if E == None else N)
+        return E
+    if metodo == 'paralelo': # Requiere K como potencial muestreado, siempre propaga con numerov_vec
+        raices = raices_paralelo(K, L, tol_e, E_max, n, delta_e, tol_e, refinar)
+        return raices[N - 1] if len(raices) >= N else None
+    if metodo == 'nodos': # Requiere K como potencial muestreado, el conteo ubica el nivel y el residuo lo refina
+        conteo = ConteoNiveles(K, L, tol_e, E_max, n, tol_e)
+        return raiz_conteo(Numerov, K, L, N, n, conteo, tol_e, E_max, delta_e, tol_e, refinar)
+    return raiz_n(Numerov, tol_e, E_max, N, delta_e, tol_e, refinar)
     
-def Solve_Schr(Vx, E_max, L, N, n):
-    x_vec, V_vec = discretizar(Vx, -L/2, L/2, n)
-    V_min = min(V_vec)
-    K = lambda e, x : e - Vx(x) + V_min
-    E = E_N(K, E_max - V_min, L, N, n)
-    if E != None:
-        x_vec, phi = Phi(K, L, E, N, n)
-        E = E + V_min
-        display(Latex('\(E_{' + str(N) + '} = ' + str(E) + '\)'))
-        V_vec = [Vx(i) for i in x_vec]
-        graficar_potencial(x_vec, V_vec)
-        V_max = max(V_vec)
-        V_ref = max(abs(V_min), V_max)
-        graficar_autofuncion(x_vec, phi, V_ref)
-        graficar_autovalor(L, E)
-        plt.show()
+def resolver_Schr(Vx, E_max, L, N, n, metodo = 'barrido', delta_e = 1e-4, tol_e = 1e-6, usar_cache = True, refinar = brent, avance = None):
+    with etapa('muestreo'):
+        potencial = potencial_muestreado(Vx, L, n)
+    if usar_cache:
+        clave = cache_autoestados.clave(potencial, 'Schr', E_max, L, N, n, delta_e, tol_e, metodo, refinar.__name__)
+        encontrado, solucion = cache_autoestados.obtener(clave)
+        if not encontrado:
+            solucion = resolver_potencial(potencial, E_max, N, metodo, delta_e, tol_e, refinar, avance)
+            cache_autoestados.guardar(clave, solucion)
+        return solucion
+    return resolver_potencial(potencial, E_max, N, metodo, delta_e, tol_e, refinar, avance)
+
+def resolver_potencial(potencial, E_max, N, metodo = 'barrido', delta_e = 1e-4, tol_e = 1e-6, refinar = brent, avance = None):
+    L, n, V_min, V_vec = potencial.L, potencial.n, potencial.V_min, potencial.V_rel
+    if metodo == 'paridad': # Media malla, solo en el sector de paridad de N
+        if potencial.simetrico():
+            return resolver_paridad(potencial, E_max, N, delta_e, tol_e, refinar, avance)
+        metodo = 'barrido' # Potencial no simétrico
+    if metodo == 'mapeada': # Malla no uniforme con n puntos, concentrados en la región permitida
+        return resolver_mapeado(potencial, E_max, N, delta_e, tol_e, refinar, avance)
+    if metodo == 'convergencia': # tol_e es la tolerancia del autovalor extrapolado
+        informe = convergencia_Schr(potencial.Vx, E_max, L, N, n, tol_e)
+        return None if informe == None else (informe['E'], informe['x'], informe['phi'])
+    if metodo == 'tridiagonal':
+        with etapa('tridiagonal'):
+            E_vec, estados = espectro_tridiagonal(V_vec, E_max - V_min, L, n, [N])
+        if len(E_vec) < N:
+            return None
+        x_vec, phi = estados[0]
+        return E_vec[N - 1] + V_min, x_vec, phi
+    E = E_N(V_vec, E_max - V_min, L, N, n, delta_e, tol_e, propagador = numerov_vec, metodo = metodo, usar_cache = False, refinar = refinar, avance = avance)
+    if E == None:
+        return None
+    with etapa('reconstruccion'):
+        x_vec, phi = Phi_vec(V_vec, L, E, N, n, potencial.cruces())
+    return E + V_min, x_vec, phi
+
+# Para comparar el costo del refinamiento, `comparar_refinamiento` cuenta las propagaciones de Numerov que requiere `E_N` para el nivel $N$ con cada combinación de búsqueda (`incremental` o `barrido`) y refinamiento (`biseccion` o `brent`). En el `barrido` las energías de la malla se propagan en bloque, de manera que las evaluaciones contadas son solo las del refinamiento.
+
+def comparar_refinamiento(Vx, E_max, L, N, n, delta_e = 1e-4, tol_e = 1e-6, metodos = ('incremental', 'barrido')):
+    potencial = potencial_muestreado(Vx, L, n)
+    V_min, V_vec = potencial.V_min, potencial.V_rel
+    resultados = []
+    for metodo in metodos:
+        for refinar in (biseccion, brent):
+            contador = Contador(numerov_vec)
+            E = E_N(V_vec, E_max - V_min, L, N, n, delta_e, tol_e, contador, metodo, False, refinar)
+            resultados.append({'metodo': metodo, 'refinar': refinar.__name__,
+                               'E': None if E == None else E + V_min, 'evaluaciones': contador.evaluaciones})
+    return resultados
+
+# Para obtener varios niveles (por ejemplo, un diagrama de niveles con los primeros seis estados) no es necesario repetir la búsqueda por cada $N$: `espectro_Schr` recorre una sola vez el intervalo de energía con `barrido` (o con el paso adaptativo, con `metodo = 'adaptativo'`), refina cada intervalo candidato con `refinar` (`brent` por defecto, descartando las discontinuidades) y reconstruye con `Phi_vec` solo las funciones de onda de los niveles solicitados. El resultado es un objeto `Espectro` con todos los niveles hallados, cada uno con su energía, el número de nodos de la propagación con `nodos_vec`, el punto de empate de `CrucesPotencial`, el residuo de `numerov_vec` en la energía refinada y el número de evaluaciones que costó su refinamiento.
+# 
+# Los niveles se construyen en `niveles_Schr`, un generador que entrega cada `Nivel` (con su función de onda, si es de los solicitados) apenas se refina, mientras que `espectro_Schr` los reúne todos. Como el barrido avanza por bloques de energía, quien deja de iterar tras el estado base no propaga los bloques siguientes; así, un notebook puede mostrar (o un barrido de parámetros guardar) los primeros niveles mientras se calculan los demás:
+# 
+#     for nivel in niveles_Schr(Vx, E_max, L, n):
+#         print(nivel.N, nivel.E)
+
+class Nivel:
+    def __init__(self, N, E, nodos, empate, residuo, evaluaciones, x = None, phi = None):
+        self.N = N
+        self.E = E
+        self.nodos = nodos
+        self.empate = empate
+        self.residuo = residuo
+        self.evaluaciones = evaluaciones
+        self.x = x
+        self.phi = phi
+
+class Espectro:
+    def __init__(self, niveles):
+        self.niveles = niveles
+
+    def energias(self):
+        return [nivel.E for nivel in self.niveles]
+
+    def estado(self, N): # Misma forma (E, x, phi) de Solve_Schr
+        nivel = self.niveles[N - 1]
+        return nivel.E, nivel.x, nivel.phi
+
+def espectro_Schr(Vx, E_max, L, n, niveles = None, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, metodo = 'barrido'):
+    potencial = potencial_muestreado(Vx, L, n)
+    return Espectro(list(niveles_Schr(potencial, E_max, L, n, niveles, delta_e, tol_e, refinar, metodo)))
+
+def niveles_Schr(Vx, E_max, L, n, niveles = None, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, metodo = 'barrido'):
+    potencial = potencial_muestreado(Vx, L, n)
+    V_min, V_vec = potencial.V_min, potencial.V_rel
+    cruces = potencial.cruces()
+    Numerov = lambda e: numerov_vec(V_vec, L, e, 1, n, cruces)
+    N = 0
+    if metodo == 'adaptativo':
+        intervalos = intervalos_adaptativos(V_vec, L, tol_e, E_max - V_min, n, delta_e, tol_x = tol_e)
+    else:
+        intervalos = intervalos_barrido(V_vec, L, tol_e, E_max - V_min, n, delta_e)
+    for c0, c1 in intervalos:
+        contador = Contador(Numerov)
+        E = refinar(contador, c0, c1, tol_e)
+        if E != None:
+            N = N + 1
+            nivel = Nivel(N, E + V_min, nodos_vec(V_vec, L, E, n), cruces.empate(E), Numerov(E), contador.evaluaciones)
+            if niveles == None or N in niveles:
+                nivel.x, nivel.phi = Phi_vec(V_vec, L, E, N, n, cruces)
+            yield nivel
+    if metodo == 'adaptativo':
+        advertir_niveles(V_vec, L, E_max - V_min, n, N)
+
+def Solve_Schr(Vx, E_max, L, N, n, metodo = 'barrido', vista = None):
+    from vis_int import display, Latex, plt
+    with etapa('muestreo'):
+        potencial = potencial_muestreado(Vx, L, n)
+    if metodo == 'convergencia': # Se reporta el error estimado y la malla necesaria
+        informe = convergencia_Schr(potencial.Vx, E_max, L, N, n)
+        solucion = None if informe == None else (informe['E'], informe['x'], informe['phi'])
+    else:
+        solucion = resolver_Schr(potencial, E_max, L, N, n, metodo)
+    if solucion != None:
+        E, x_vec, phi = solucion
+        with etapa('graficas'):
+            display(Latex('\(E_{' + str(N) + '} = ' + str(E) + '\)'))
+            if metodo == 'convergencia':
+                display(Latex('Error estimado \(' + '%.1e' % informe['error'] + '\) con \(n = ' + str(informe['n']) + '\)'))
+            graficar_solucion(potencial, E, x_vec, phi, vista)
+            if vista == None:
+                plt.show()
+            else: # Misma figura, solo con los datos actualizados
+                display(vista.figura)
         return E, x_vec, phi
     else:
-        display(HTML('<div class="alert alert-danger">'+\
-             '<strong>Error</strong> Se evaluo la función en una discontinuidad.'+\
-             '</div>'))
+        display(alerta_discontinuidad())
+
+def graficar_solucion(potencial, E, x_vec, phi, vista = None):
+    from vis_int import graficar_potencial, graficar_autofuncion, graficar_autovalor
+    V_ref = max(abs(potencial.V_min), potencial.V_max)
+    if vista != None:
+        vista.potencial(potencial.x, potencial.V_malla())
+        vista.autofuncion(x_vec, phi, V_ref)
+        vista.autovalor(potencial.L, E)
+        vista.dibujar()
+        return
+    graficar_potencial(potencial.x, potencial.V_malla()) # Misma muestra usada en la búsqueda
+    graficar_autofuncion(x_vec, phi, V_ref)
+    graficar_autovalor(potencial.L, E)
+
+def alerta_discontinuidad():
+    from vis_int import HTML
+    return HTML('<div class="alert alert-danger">'+\
+         '<strong>Error</strong> Se evaluo la función en una discontinuidad.'+\
+         '</div>')
 
 
 def fun_contenedor_base():
+    from vis_int import FloatSlider, IntSlider, Box
     E_max = FloatSlider(value=10., min = 1., max=20., step=1., description= '$E_{max}$')
     L = FloatSlider(value = 30., min = 10., max = 100., step= 1., description='L')
     N = IntSlider(value=1, min=1, max= 6, step=1, description='N')
@@ -362,8 +1398,526 @@ def agregar_control(base, control):
     base.children = tuple(controles)
 
 
+# ### Convergencia en la malla
+# 
+# El número de elementos $n$ fija el error de discretización del autovalor, que no se conoce de antemano. `convergencia_Schr` resuelve el nivel $N$ en una sucesión de mallas $n, 2n, 4n, \dots$ y extrapola (extrapolación de Richardson) con las dos últimas, $E^{*} = E_{h/2} + (E_{h/2} - E_h) / (2^p - 1)$, hasta que la diferencia entre dos extrapolaciones sucesivas (el error estimado) es menor que la tolerancia. En cada malla se usa el conteo de nodos de `intervalo_nodos`, cuyo error decrece de forma regular como $h^4$ para potenciales suaves, mientras que el residuo del disparo cambia de punto de empate entre mallas y no converge de forma regular. El autovalor de la malla anterior da un intervalo estrecho para la siguiente (varias veces la última corrección), de manera que no se repite la búsqueda completa; como el conteo de nodos verifica que el nivel $N$ esté en el intervalo, si no lo está se busca en todo el intervalo de energía. El orden $p$ se estima con las tres últimas mallas (con $p = 4$ mientras no las haya, o si la estimación no es razonable). Para potenciales discontinuos, como el pozo finito, la convergencia es irregular y el error estimado lo refleja. El informe incluye la malla necesaria, el orden y los autovalores de cada malla; la función de onda es la de la malla más fina.
+
+# In[19]:
+
+def convergencia_Schr(Vx, E_max, L, N, n, tol = 1e-6, factor = 2, n_max = 20000, orden = 4):
+    mallas = []
+    E_ext = None
+    error = None
+    p = orden
+    while n <= n_max:
+        potencial = potencial_muestreado(Vx, L, n)
+        V_vec, V_min = potencial.V_rel, potencial.V_min
+        intervalo = None
+        if mallas: # Intervalo estrecho alrededor del autovalor de la malla anterior
+            E_ant = mallas[-1]['E']
+            ancho = 4 * abs(E_ant - mallas[-2]['E']) + tol if len(mallas) > 1 else 1e-2 * (E_ant - V_min) + tol
+            intervalo = intervalo_nodos(V_vec, L, max(E_ant - ancho - V_min, 0.0), min(E_ant + ancho - V_min, E_max - V_min), N, n, tol / 100)
+        if intervalo == None:
+            intervalo = intervalo_nodos(V_vec, L, 0.0, E_max - V_min, N, n, tol / 100)
+            if intervalo == None:
+                return None
+        E = (intervalo[0] + intervalo[1]) / 2.0 + V_min
+        mallas.append({'n': n, 'E': E})
+        if len(mallas) > 2:
+            d0 = mallas[-2]['E'] - mallas[-3]['E']
+            d1 = E - mallas[-2]['E']
+            p_est = log(d0 / d1) / log(factor) if d0 * d1 > 0 else 0
+            p = p_est if 1 <= p_est <= 8 else orden
+        if len(mallas) > 1:
+            E_ext_ant = E_ext
+            E_ext = E + (E - mallas[-2]['E']) / (factor**p - 1)
+            error = abs(E_ext - E_ext_ant) if E_ext_ant != None else abs(E - mallas[-2]['E'])
+            if error < tol:
+                break
+        n = n * factor
+    if E_ext == None: # Una sola malla (n_max muy pequeño)
+        E_ext = E
+    x_vec, phi = Phi_vec(V_vec, L, E - V_min, N, potencial.n, potencial.cruces())
+    return {'E': E_ext, 'error': error, 'n': potencial.n, 'orden': p, 'convergio': error != None and error < tol,
+            'mallas': mallas, 'x': x_vec, 'phi': phi}
+
+
+# ### Mallas mapeadas
+# 
+# Con la malla uniforme de paso $L/n$, en intervalos amplios (hasta $L = 100$ en los controles) la mayoría de los puntos caen en las colas prohibidas, lejos del pozo, donde la función de onda es casi nula. Una malla mapeada usa una coordenada $u$ con paso uniforme $h$ y la transformación $x = x_0 + c \sinh u$, cuyo paso $\Delta x \approx c \cosh u \, h$ es casi constante en $|x - x_0| \lesssim c$ y crece linealmente hacia las fronteras. El centro $x_0$ y la escala $c$ se toman de la región permitida a $E_{max}$ (donde $V < E_{max}$) en la muestra uniforme, de forma que la resolución queda sobre los pozos y los puntos de retorno.
+# 
+# Numerov aplicado directamente sobre una malla no uniforme pierde su cuarto orden. En cambio, con $\psi(x) = \sqrt{x'(u)}\, \chi(u)$ (transformación de Liouville), la ecuación de Schrödinger queda sin primera derivada en la variable $u$,
+# $$ \chi''(u) + \left[x'^2 \left(E - V(x(u))\right) + Q(u)\right] \chi = 0, \qquad Q = \frac{x'''}{2x'} - \frac{3}{4}\left(\frac{x''}{x'}\right)^2 = \frac{1}{2} - \frac{3}{4}\tanh^2 u, $$
+# que se propaga con la misma recurrencia de Numerov (en cocientes, como `numerov_vec`) sobre la malla uniforme en $u$, con $\chi = 0$ en las fronteras. Las dos propagaciones llegan al nodo de empate $m$ con $\chi_m = 1$, y el residuo es la propia recurrencia de Numerov en ese nodo,
+# $$ R(E) = \frac{c^{(0)}_{m-1} \frac{\chi_{m-1}}{\chi_m} + c^{(0)}_{m+1} \frac{\chi_{m+1}}{\chi_m} - c^{(1)}_m}{h}, $$
+# que se anula exactamente en los autovalores de la ecuación discreta (sin el sesgo de orden $h$ de comparar solo las derivadas) y que, dividido por $h$, es la diferencia entre las derivadas logarítmicas de ambos lados. El empate se hace en el punto de retorno más alejado de su frontera (el primer nodo con $E > V$, o el último si la frontera izquierda ya está en la región permitida), donde $\chi$ no es pequeña. En las colas, $x'^2 (V - E)$ crece como $\cosh^2 u$, y $h^2 |K|$ llega a miles en $L = 100$ (también con la malla uniforme), de manera que $c^{(0)} = 1 + h^2 K / 12$ cambiaría de signo; como la función de onda es despreciable allí, $K$ se acota por debajo en $-q_{max}/h^2$ (`q_max` $= 6$, con $c^{(0)} \geq 1/2$), lo que no cambia los autovalores. `resolver_potencial` con `metodo = 'mapeada'` usa una malla mapeada con el mismo número de puntos $n$ (la muestra uniforme solo fija $x_0$ y $c$), busca los intervalos con un barrido en bloque y reconstruye $\psi$ en los nodos $x_i$. Para $V = x^2$ con $E_{max} = 12$, los seis primeros niveles se encuentran en todo el rango de los controles; con $L = 30$ y $n = 300$ el error es de $6 \times 10^{-8}$ a $1.5 \times 10^{-5}$ (frente a $10^{-6}$ a $1.8 \times 10^{-4}$ con la malla uniforme y el residuo de paridad), y con $L = 100$ y $n = 100$ es de $2 \times 10^{-5}$ a $5 \times 10^{-3}$. Con el pozo finito, discontinuo, el error es del mismo orden que con la malla uniforme.
+
+# In[20]:
+
+def evaluar_potencial(Vx, x_vec):
+    if perfil_activo != None:
+        perfil_activo.contar('potencial', len(x_vec))
+    if getattr(Vx, 'vectorizada', False):
+        return np.asarray(Vx(np.asarray(x_vec)), dtype=float)
+    return np.array([Vx(x) for x in x_vec], dtype=float)
+
+class MallaMapeada:
+    __slots__ = ('Vx', 'L', 'n', 'x0', 'c', 'h', 'K_min', 'x', 'dx', 'peso', 'Q', 'V', 'V_min', 'V_rel', 'cota', 'cota_d')
+
+    def __init__(self, Vx, L, n, x0, c, q_max = 6.0):
+        self.Vx = Vx
+        self.L = L
+        self.n = n
+        self.x0 = x0
+        self.c = c
+        u_a = asinh((-L/2 - x0) / c)
+        self.h = (asinh((L/2 - x0) / c) - u_a) / n
+        self.K_min = -q_max / self.h**2 # h^2 |K| <= q_max en las colas prohibidas
+        u = u_a + self.h * np.arange(n + 1)
+        self.x = x0 + c * np.sinh(u)
+        self.x[0], self.x[n] = -L/2, L/2
+        self.dx = c * np.cosh(u) # x'(u)
+        self.peso = self.dx**2
+        self.Q = 0.5 - 0.75 * np.tanh(u)**2
+        self.V = evaluar_potencial(Vx, self.x)
+        self.V_min = float(self.V.min())
+        self.V_rel = self.V - self.V_min
+        self.cota = np.minimum.accumulate(self.V_rel)[::-1] # No decrecientes, para ubicar el empate
+        self.cota_d = np.minimum.accumulate(self.V_rel[::-1])[::-1]
+
+    def empate(self, E): # Primer o último nodo con E > V, el más alejado de su frontera, entre 1 y n - 1
+        j = self.n + 1 - np.searchsorted(self.cota, E, side='left')
+        j_d = np.searchsorted(self.cota_d, E, side='left') - 1
+        return np.clip(np.where(j >= self.n - j_d, j, j_d), 1, self.n - 1)
+
+    def coeficientes(self, E):
+        K_vec = np.maximum(self.peso * (E - self.V_rel) + self.Q, self.K_min)
+        return (1 + self.h**2 * K_vec / 12).tolist(), (2 - 5 * self.h**2 * K_vec / 6).tolist()
+
+def malla_mapeada(potencial, E_max, escala = 1.0):
+    x_vec = np.array(potencial.x)
+    permitidos = np.flatnonzero(potencial.V_malla() < E_max)
+    if len(permitidos) == 0:
+        x_a, x_b = -potencial.L/2, potencial.L/2
+    else:
+        x_a, x_b = x_vec[permitidos[0]], x_vec[permitidos[-1]]
+    c = escala * max((x_b - x_a) / 2, potencial.h)
+    return MallaMapeada(potencial.Vx, potencial.L, potencial.n, (x_a + x_b) / 2, c)
+
+def numerov_mapeado(malla, E):
+    n = malla.n
+    c0, c1 = malla.coeficientes(E)
+    m = int(malla.empate(E))
+    s_i = 0.0
+    for i in range(1, m):
+        s_i = c0[i + 1] / (c1[i] - c0[i - 1] * s_i)
+    s_d = 0.0
+    for i in range(n - 1, m, -1):
+        s_d = c0[i - 1] / (c1[i] - c0[i + 1] * s_d)
+    return (c0[m - 1] * s_i + c0[m + 1] * s_d - c1[m]) / malla.h # Recurrencia de Numerov en el nodo de empate
+
+def numerov_mapeado_barrido(malla, E_vec):
+    n, h = malla.n, malla.h
+    E_vec = np.asarray(E_vec, dtype=float)
+    if perfil_activo != None:
+        perfil_activo.contar('energias_barrido', len(E_vec))
+    m = malla.empate(E_vec)
+    K = lambda i: np.maximum(malla.peso[i] * (E_vec - malla.V_rel[i]) + malla.Q[i], malla.K_min) # i puede ser el vector m
+    c0 = lambda i: 1 + h**2 * K(i) / 12
+    c1 = lambda i: 2 - 5 * h**2 * K(i) / 6
+    with np.errstate(all='ignore'):
+        s_i = np.zeros_like(E_vec)
+        for i in range(1, m.max()):
+            s_i = np.where(i < m, c0(i + 1) / (c1(i) - c0(i - 1) * s_i), s_i)
+        s_d = np.zeros_like(E_vec)
+        for i in range(n - 1, m.min(), -1):
+            s_d = np.where(i > m, c0(i - 1) / (c1(i) - c0(i + 1) * s_d), s_d)
+        return (c0(m - 1) * s_i + c0(m + 1) * s_d - c1(m)) / h
+
+def intervalos_mapeados(malla, a, b, delta_x = 1e-4, bloque = 2**15, avance = None):
+    E_vec = a + delta_x * np.arange(int((b - a) / delta_x) + 1)
+    for i in range(0, len(E_vec) - 1, bloque):
+        E_bloque = E_vec[i:i + bloque + 1] # Cada bloque repite el último punto del anterior, como en barrido_bloques
+        residuos = numerov_mapeado_barrido(malla, E_bloque)
+        if avance != None:
+            avance((E_bloque[-1] - a) / (b - a))
+        for k in np.flatnonzero(~(residuos[:-1] * residuos[1:] > 0)):
+            yield E_bloque[k], E_bloque[k + 1]
+
+def Phi_mapeado(malla, E):
+    n = malla.n
+    c0, c1 = malla.coeficientes(E)
+    m = int(malla.empate(E))
+    s_g = [0.0]
+    for i in range(1, m):
+        s_g.append(c0[i + 1] / (c1[i] - c0[i - 1] * s_g[-1]))
+    s_gd = [0.0]
+    for i in range(n - 1, m, -1):
+        s_gd.append(c0[i - 1] / (c1[i] - c0[i + 1] * s_gd[-1]))
+    chi = [1.0] # Valor 1 en el nodo de empate
+    for s in reversed(s_g):
+        chi.append(s * chi[-1])
+    chi.reverse()
+    for s in reversed(s_gd):
+        chi.append(s * chi[-1])
+    return malla.x.tolist(), (np.sqrt(malla.dx) * np.array(chi)).tolist()
+
+def resolver_mapeado(potencial, E_max, N, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, avance = None):
+    malla = potencial.derivado(('mapeada', E_max), lambda potencial: malla_mapeada(potencial, E_max))
+    Numerov = lambda e: numerov_mapeado(malla, e)
+    if perfil_activo != None:
+        Numerov = perfil_activo.contado('numerov', Numerov)
+        refinar = perfil_activo.refinamiento(refinar)
+    with etapa('E_N'):
+        intervalos = intervalos_mapeados(malla, tol_e, E_max - malla.V_min, delta_e, avance = avance)
+        E = raiz_n_intervalos(Numerov, intervalos, N, tol_e, refinar)
+    if E == None:
+        return None
+    with etapa('reconstruccion'):
+        x_vec, phi = Phi_mapeado(malla, E)
+    return E + malla.V_min, x_vec, phi
+
+
+# ### Potenciales simétricos
+# 
+# El pozo finito (`V_fin`), el oscilador (`V_arm`) y muchos de los potenciales usuales son pares, $V(-x) = V(x)$, y sus autoestados son alternadamente pares e impares: el nivel $N$ tiene paridad $(-1)^{N-1}$. La simetría se detecta sobre la muestra (`PotencialMuestreado.simetrico`, que compara $V_i$ con $V_{n-i}$); en ese caso basta propagar (en cocientes, como `numerov_vec`) desde $x = L/2$ hasta el centro, e imponer allí la condición de paridad sobre la misma recurrencia de Numerov. Con $n$ par el centro es el nodo $k = n/2$, y la condición es $\phi_{k-1} = \phi_{k+1}$ (pares), es decir $2 c^{(0)}_{k+1} \phi_{k+1} = c^{(1)}_k \phi_k$, o $\phi_k = 0$ (impares); con $n$ impar el centro queda entre los nodos $k = (n-1)/2$ y $k + 1$, y la condición es $\phi_{k+1} = \pm\phi_k$. Cada propagación recorre la mitad de la malla, y las dos condiciones salen del mismo par $(\phi_k, \phi_{k+1})$, de manera que un solo barrido en bloque entrega los residuos de ambos sectores a la vez. El par se propaga en amplitudes y se normaliza en cada paso (sin cambiar su signo), y los residuos son combinaciones lineales de sus componentes, $2 c^{(0)}_{k+1} \phi_{k+1} - c^{(1)}_k \phi_k$ o $\phi_k$, y $\phi_{k+1} \mp \phi_k$: a diferencia del cociente $\phi_{k+1}/\phi_k$, no tienen polos en los niveles del otro sector. Por eso la raíz se refina sin la verificación con `factor_ty` (`sin_polos`), que en un par casi degenerado descartaría raíces verdaderas: en el pozo doble $(x^2 - 9)^2/4$ con $L = 12$ y $n = 400$ el residuo pasa de un signo al otro en un intervalo del orden de la separación del par ($10^{-6}$), y `espectro_paridad` entrega los cuatro niveles, $2.94188$, $2.94188$, $8.57015$ y $8.57032$, los mismos del conteo de nodos.
+# 
+# En cada sector los niveles están separados el doble que en el espectro completo, y el nivel $N$ es la raíz $\lceil N/2 \rceil$ de su sector, de forma que `resolver_paridad` solo busca en el sector de $N$ y se detiene en esa raíz. La función de onda se reconstruye en $[0, L/2]$ desde el centro y se refleja con su paridad. A diferencia del residuo de `numerov`, que depende del punto de empate, estas condiciones son exactas para la recurrencia discreta, y los autovalores coinciden con los del conteo de nodos. `resolver_potencial` usa este método con `metodo = 'paridad'` cuando la muestra es simétrica (y el `barrido` en otro caso). No se elige por omisión: el residuo de `numerov` tiene un sesgo de orden $h$ que estas condiciones no tienen (con el oscilador $\omega = 1$, $L = 30$ y $n = 300$, el estado base es $0.4863$ con el `barrido` y $0.5000$ con la paridad), y el autovalor de una misma muestra dependería de si esta resulta simétrica al redondeo, en desacuerdo con `espectro_Schr` y `niveles_Schr`; `espectro_paridad` entrega todos los niveles de ambos sectores, ordenados.
+
+# In[21]:
+
+def residuo_paridad(p, q, paridad, c0, c1, n): # (p, q) = (phi_k, phi_(k+1)), normalizado
+    k = n // 2 # Nodo central (n par) o el nodo a la izquierda del centro (n impar)
+    if n % 2 == 0:
+        return 2 * c0[k + 1] * q - c1[k] * p if paridad == 0 else p
+    return q - p if paridad == 0 else q + p
+
+def cocientes_paridad(c0, c1, n):
+    t = [0.0] # phi_n / phi_(n-1)
+    for i in range(n - 1, n // 2, -1):
+        t.append(c0[i - 1] / (c1[i] - c0[i + 1] * t[-1]))
+    return t
+
+def numerov_paridad(V_vec, L, E, paridad, n):
+    K_vec, c0, c1 = coeficientes_numerov(V_vec, L / n, E)
+    p, q = 1.0, 0.0 # phi_(n-1), phi_n
+    for i in range(n - 1, n // 2, -1):
+        p, q = (c1[i] * p - c0[i + 1] * q) / c0[i - 1], p
+        norma = hypot(p, q) # Sin desbordes y sin cambiar el signo del par
+        p, q = p / norma, q / norma
+    return residuo_paridad(p, q, paridad, c0, c1, n)
+
+def numerov_paridad_barrido(V_vec, L, E_vec, n):
+    h = L / n
+    E_vec = np.asarray(E_vec, dtype=float)
+    if perfil_activo != None:
+        perfil_activo.contar('energias_barrido', len(E_vec))
+    c0 = lambda i: 1 + h**2 * (E_vec - V_vec[i]) / 12
+    c1 = lambda i: 2 - 5 * h**2 * (E_vec - V_vec[i]) / 6
+    k = n // 2
+    with np.errstate(all='ignore'):
+        p, q = np.ones_like(E_vec), np.zeros_like(E_vec)
+        for i in range(n - 1, k, -1):
+            p, q = (c1(i) * p - c0(i + 1) * q) / c0(i - 1), p
+            norma = np.hypot(p, q)
+            p, q = p / norma, q / norma
+        if n % 2 == 0:
+            return 2 * c0(k + 1) * q - c1(k) * p, p
+        return q - p, q + p
+
+def intervalos_paridad(V_vec, L, a, b, n, delta_x = 1e-4, bloque = 2**15, avance = None):
+    E_vec = a + delta_x * np.arange(int((b - a) / delta_x) + 1)
+    for i in range(0, len(E_vec) - 1, bloque):
+        E_bloque = E_vec[i:i + bloque + 1] # Cada bloque repite el último punto del anterior, como en barrido_bloques
+        residuos = numerov_paridad_barrido(V_vec, L, E_bloque, n)
+        if avance != None:
+            avance((E_bloque[-1] - a) / (b - a))
+        cambios = [np.flatnonzero(~(r[:-1] * r[1:] > 0)) for r in residuos]
+        for k in np.union1d(*cambios):
+            yield E_bloque[k], E_bloque[k + 1], [paridad for paridad in (0, 1) if k in cambios[paridad]]
+
+def Phi_paridad(V_vec, L, E, paridad, n):
+    K_vec, c0, c1 = coeficientes_numerov(V_vec, L / n, E)
+    t = cocientes_paridad(c0, c1, n)
+    derecha = [1.0] # phi_(k+1), y hacia la frontera derecha
+    for s in reversed(t[:-1]):
+        derecha.append(s * derecha[-1])
+    signo = 1 - 2 * paridad
+    izquierda = [signo * phi for phi in reversed(derecha)]
+    if n % 2 == 0: # El nodo central es su propio reflejo
+        centro = derecha[0] / t[-1] if paridad == 0 else 0.0
+        izquierda.append(centro)
+    phi = izquierda + derecha
+    return [-L/2 + i * L / n for i in range(n + 1)], phi
+
+def sin_polos(refinar): # Los residuos de paridad son continuos: todo cambio de signo es una raíz
+    def refinar_continuo(funcion, a, b, tol_x = 1e-6):
+        return refinar(funcion, a, b, tol_x, factor_ty = np.inf)
+    refinar_continuo.__name__ = refinar.__name__
+    return refinar_continuo
+
+def raices_paridad(V_vec, L, a, b, n, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, avance = None, paridades = (0, 1)):
+    Numerov = [lambda e: numerov_paridad(V_vec, L, e, 0, n), lambda e: numerov_paridad(V_vec, L, e, 1, n)]
+    refinar = sin_polos(refinar)
+    if perfil_activo != None:
+        Numerov = [perfil_activo.contado('numerov', funcion) for funcion in Numerov]
+        refinar = perfil_activo.refinamiento(refinar)
+    for c0, c1, cambios in intervalos_paridad(V_vec, L, a, b, n, delta_e, avance = avance):
+        for paridad in set(paridades).intersection(cambios):
+            c = refinar(Numerov[paridad], c0, c1, tol_e)
+            if c != None:
+                yield c, paridad
+
+def resolver_paridad(potencial, E_max, N, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, avance = None):
+    L, n, V_min, V_vec = potencial.L, potencial.n, potencial.V_min, potencial.V_rel
+    paridad, m = (N - 1) % 2, (N + 1) // 2
+    with etapa('E_N'):
+        raices = raices_paridad(V_vec, L, tol_e, E_max - V_min, n, delta_e, tol_e, refinar, avance, (paridad,))
+        E = next((E for j, (E, p) in enumerate(raices, 1) if j == m), None)
+    if E == None:
+        return None
+    with etapa('reconstruccion'):
+        x_vec, phi = Phi_paridad(V_vec, L, E, paridad, n)
+    return E + V_min, x_vec, phi
+
+def espectro_paridad(Vx, E_max, L, n, delta_e = 1e-4, tol_e = 1e-6, refinar = brent):
+    potencial = potencial_muestreado(Vx, L, n)
+    if not potencial.simetrico():
+        return None
+    raices = raices_paridad(potencial.V_rel, L, tol_e, E_max - potencial.V_min, n, delta_e, tol_e, refinar)
+    return sorted((E + potencial.V_min, paridad) for E, paridad in raices)
+
+
+# ### Núcleos de propagación
+# 
+# La recurrencia de Numerov es secuencial a lo largo de la malla, de manera que `numpy` solo la acelera al propagar muchas energías a la vez (como en `numerov_barrido`), y una sola propagación (`numerov_vec`, en cada paso del refinamiento) paga el costo del intérprete en cada nodo. El núcleo que calcula los residuos, dados el potencial muestreado, las energías y sus índices de empate, se elige en un registro con tres implementaciones equivalentes: `python` (la referencia, un ciclo sobre listas), `numpy` (por lotes de energías, solo para varias energías) y `numba`, que compila con `numba.njit` una versión con ciclos explícitos cuando `numba` está instalado. Sin `numba` el registro simplemente lo omite.
+# 
+# Por defecto se usa el primero disponible en el orden del registro (`numba`, luego `numpy` para lotes y `python` para energías individuales); `usar_nucleo` fija uno (con `None` se vuelve a la elección automática) y `registrar_nucleo` agrega otro, al comienzo del orden de preferencia. La compilación de `numba` ocurre en el primer llamado y se guarda en disco para los siguientes (y para los procesos de `BusquedaParalela`). `rendimiento` verifica que todos los núcleos disponibles den los mismos residuos (`verificar_nucleos`, también como prueba en `test_tecnicas_numericas`) y mide la aceleración de cada uno frente a `python`.
+
+# In[22]:
+
+def residuos_lote(V_vec, h, E_vec, i_ade, i_atr, n): # Fuente del núcleo compilado, con ciclos explícitos
+    residuos = np.empty(len(E_vec))
+    for j in range(len(E_vec)):
+        E = E_vec[j]
+        s_i = 0.0
+        for i in range(2, i_ade[j] + 1):
+            s_i = (1 + h**2 * (E - V_vec[i + 1]) / 12) / (2 - 5 * h**2 * (E - V_vec[i]) / 6 - (1 + h**2 * (E - V_vec[i - 1]) / 12) * s_i)
+        s_d = 0.0
+        for i in range(n - 2, i_atr[j] - 1, -1):
+            s_d = (1 + h**2 * (E - V_vec[i - 1]) / 12) / (2 - 5 * h**2 * (E - V_vec[i]) / 6 - (1 + h**2 * (E - V_vec[i + 1]) / 12) * s_d)
+        residuos[j] = (2 - s_i - s_d) / (s_d - s_i)
+    return residuos
+
+@lru_cache(maxsize=None)
+def cargar_nucleo_numba(): # numba se importa y compila solo al usarse
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache = True, error_model = 'numpy')(residuos_lote)
+
+nucleos_numerov = OrderedDict([('numba', (cargar_nucleo_numba, False)), # nombre: (cargar, solo por lotes)
+                               ('numpy', (lambda: residuos_numpy, True)),
+                               ('python', (lambda: residuos_python, False))])
+nucleo_elegido = None
+
+def registrar_nucleo(nombre, cargar, por_lotes = False):
+    nucleos_numerov[nombre] = (cargar, por_lotes)
+    nucleos_numerov.move_to_end(nombre, last = False)
+
+def nucleos_disponibles():
+    return [nombre for nombre, (cargar, por_lotes) in nucleos_numerov.items() if cargar() != None]
+
+def usar_nucleo(nombre = None):
+    global nucleo_elegido
+    if nombre != None and nombre not in nucleos_disponibles():
+        raise ValueError('Núcleo no disponible: ' + nombre)
+    nucleo_elegido = nombre
+
+def nucleo_numerov(lote = True):
+    if nucleo_elegido != None:
+        return nucleos_numerov[nucleo_elegido][0]()
+    for cargar, por_lotes in nucleos_numerov.values():
+        if por_lotes and not lote:
+            continue
+        nucleo = cargar()
+        if nucleo != None:
+            return nucleo
+
+
+# ### Continuación en los parámetros
+# 
+# Al mover un deslizador de los controles (el ancho $a$, la profundidad $V_0$ o la frecuencia $\omega$) en un paso, los autovalores cambian poco, y sin embargo cada solución vuelve a barrer la energía desde `tol_e`. `Continuacion` guarda, para un control o una sesión, los últimos estados resueltos de cada nivel con la muestra del potencial en que se resolvieron, y predice el nuevo autovalor con la corrección de primer orden en teoría de perturbaciones,
+# $$ E_N' \approx E_N + \frac{\langle \psi_N | \Delta V | \psi_N \rangle}{\langle \psi_N | \psi_N \rangle}, \qquad \Delta V = V' - V, $$
+# con las integrales por trapecios sobre los nodos de la función de onda guardada. La búsqueda se hace solo en un intervalo alrededor de la predicción, de ancho proporcional a la corrección (`factor`) más un mínimo (`ancho_min`), muestreado con `puntos` energías en un barrido en bloque y con el mismo residuo de la búsqueda completa (el del sector de paridad con `metodo = 'paridad'` y una muestra simétrica, o el de `numerov_vec`), y el nivel se identifica igual en la búsqueda cercana y en la completa, de manera que el resultado no depende de la historia del deslizador. Una raíz del intervalo solo se acepta si el conteo de nodos la asigna al nivel $N$ (`ConteoNiveles.asignado`, el mismo criterio de `E_N` con `metodo = 'nodos'`); si el conteo le asigna varias, vale la más cercana a su autovalor, y como los `puntos` del intervalo pueden dejar otra entre ellos, la raíz hallada solo acota la distancia: la elección final es la de `raiz_conteo` (la misma búsqueda de `E_N` con `metodo = 'nodos'`, con paso `delta_e` desde el nivel del conteo) restringida a esa distancia. La búsqueda completa, cuando ninguna lo cumple (la predicción falló, o cambiaron $L$, $n$ o el método), es `resolver_Schr` con `metodo = 'nodos'` en lugar del `barrido` (con `'paridad'`, la del sector, cuyas raíces son las del conteo). Contar las raíces en orden, como el `barrido`, no basta: con $V = \omega^2 x^2/4$, $L = 30$, $n = 300$ y $\omega = 1.6$ el residuo tiene dos raíces sin nodos, $0.7728$ y $0.7755$, a ambos lados del salto donde cambia el punto de empate, y el `barrido` entrega $2.374$ como $N = 3$ en lugar de $3.970$; el conteo asigna ambas al estado base (cuyo autovalor es $0.8000$), y vale $0.7755$, la más cercana. Cuando el residuo no tiene una raíz para el nivel (como con $\frac{x^2}{4} + 0.03 x^3$, $L = 20$ y $N = 5$, cuyo disparo no separa los niveles del pozo junto a la frontera izquierda), ambas búsquedas entregan `None`. Los contadores `continuaciones` y `barridos` registran cuántas soluciones se obtuvieron de cada forma.
+
+# In[23]:
+
+def integral_trapecio(y, x):
+    y, x = np.asarray(y, dtype=float), np.asarray(x, dtype=float)
+    return float(np.sum((y[1:] + y[:-1]) * np.diff(x)) / 2)
+
+def resolver_cercano(potencial, E_max, N, a, b, puntos = 33, delta_e = 1e-4, tol_e = 1e-6, refinar = brent, metodo = 'barrido'):
+    L, n, V_min, V_vec = potencial.L, potencial.n, potencial.V_min, potencial.V_rel
+    a, b = max(a - V_min, tol_e), min(b - V_min, E_max - V_min)
+    if a >= b:
+        return None
+    E_vec = np.linspace(a, b, puntos)
+    conteo = ConteoNiveles(V_vec, L, tol_e, E_max - V_min, n, tol_e) # La misma asignación de E_N con 'nodos'
+    confirmar = None
+    if metodo == 'paridad' and potencial.simetrico(): # Como en resolver_potencial, solo el sector de paridad de N
+        paridad = (N - 1) % 2
+        residuos = numerov_paridad_barrido(V_vec, L, E_vec, n)[paridad]
+        Numerov = lambda e: numerov_paridad(V_vec, L, e, paridad, n)
+        reconstruir = lambda e: Phi_paridad(V_vec, L, e, paridad, n)
+        refinar = sin_polos(refinar)
+    else:
+        cruces = potencial.cruces()
+        residuos = numerov_barrido(V_vec, L, E_vec, n)
+        Numerov = lambda e: numerov_vec(V_vec, L, e, N, n, cruces)
+        reconstruir = lambda e: Phi_vec(V_vec, L, e, N, n, cruces)
+        confirmar = lambda d: raiz_conteo(Numerov, V_vec, L, N, n, conteo, max(conteo.nivel(N) - d, tol_e), min(conteo.nivel(N) + d, E_max - V_min), delta_e, tol_e, refinar)
+    candidatos = []
+    for k in np.flatnonzero(~(residuos[:-1] * residuos[1:] > 0)):
+        E = refinar(Numerov, E_vec[k], E_vec[k + 1], tol_e)
+        if E != None and conteo.asignado(E, N):
+            candidatos.append(E)
+    if len(candidatos) == 0:
+        return None
+    E = min(candidatos, key = lambda c: abs(c - conteo.nivel(N)))
+    if confirmar != None: # El residuo puede tener otra raíz del nivel entre los puntos, más cercana al conteo
+        E = confirmar(abs(E - conteo.nivel(N)) + delta_e)
+        if E == None:
+            return None
+    x_vec, phi = reconstruir(E)
+    return E + V_min, x_vec, phi
+
+class Continuacion:
+    def __init__(self, factor = 4, ancho_min = 1e-3, puntos = 33):
+        self.factor = factor
+        self.ancho_min = ancho_min
+        self.puntos = puntos
+        self.llave = None # (L, n, metodo) de los estados guardados
+        self.estados = {}
+        self.continuaciones = 0
+        self.barridos = 0
+
+    def guardar(self, potencial, N, metodo, solucion):
+        llave = (potencial.L, potencial.n, metodo)
+        if llave != self.llave:
+            self.llave = llave
+            self.estados = {}
+        E, x_vec, phi = solucion
+        self.estados[N] = (potencial.V_malla().copy(), E, x_vec, phi)
+
+    def predecir(self, potencial, N, metodo):
+        if self.llave != (potencial.L, potencial.n, metodo) or N not in self.estados:
+            return None
+        V_previo, E, x_vec, phi = self.estados[N]
+        delta_V = np.interp(x_vec, potencial.x, potencial.V_malla() - V_previo)
+        densidad = np.asarray(phi, dtype=float)**2
+        return E + integral_trapecio(densidad * delta_V, x_vec) / integral_trapecio(densidad, x_vec), E
+
+    def resolver(self, potencial, E_max, N, metodo = 'barrido', delta_e = 1e-4, tol_e = 1e-6, refinar = brent, avance = None):
+        solucion = None
+        prediccion = self.predecir(potencial, N, metodo) if metodo in ('barrido', 'paridad') else None
+        if prediccion != None:
+            E_pred, E_previo = prediccion
+            ancho = self.factor * abs(E_pred - E_previo) + self.ancho_min
+            with etapa('E_N'):
+                solucion = resolver_cercano(potencial, E_max, N, E_pred - ancho, E_pred + ancho, self.puntos, delta_e, tol_e, refinar, metodo)
+        if solucion != None:
+            self.continuaciones = self.continuaciones + 1
+        else:
+            completo = 'nodos' if metodo == 'barrido' else metodo # El nivel se identifica igual que en resolver_cercano
+            solucion = resolver_Schr(potencial, E_max, potencial.L, N, potencial.n, completo, delta_e, tol_e, refinar = refinar, avance = avance)
+            self.barridos = self.barridos + 1
+        if solucion != None:
+            self.guardar(potencial, N, metodo, solucion)
+        return solucion
+
+
+# ### Barridos de parámetros
+# 
+# Para precalcular los espectros de una familia de potenciales (pozos finitos sobre $(V_0, a)$, osciladores sobre $\omega$, términos anarmónicos), `barrido_parametros` recibe la familia como una función de los parámetros y de $x$, con la misma forma de `V_fin(V_0, a, x)` y `V_arm(omega, x)`, y una malla de valores para cada parámetro. Cada punto de la malla se resuelve con `espectro_Schr` en un conjunto de procesos, y cada resultado se agrega a la tabla en disco apenas termina, como una línea JSON con los parámetros, las energías y, si se piden, las funciones de onda de los niveles indicados. Al volver a llamar con el mismo archivo se omiten los puntos ya guardados, de manera que un barrido interrumpido continúa donde quedó; una última línea incompleta se descarta. La primera línea de la tabla guarda la configuración del barrido (los nombres de los parámetros, $E_{max}$, $L$, $n$, los niveles, las tolerancias y el método), y solo se continúa si coincide con la pedida; si no, `barrido_parametros` lanza un `ValueError` en lugar de mezclar dos barridos en la misma tabla. `leer_barrido` entrega la configuración y los registros. La familia debe estar definida a nivel de módulo para poder enviarla a los procesos.
+
+# In[24]:
+
+def valor_tabla(valor):
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+def malla_parametros(parametros):
+    return [tuple(valor_tabla(valor) for valor in valores) for valores in product(*parametros.values())]
+
+def leer_barrido(archivo): # (configuración, registros), de la primera línea y de las demás
+    registros = []
+    if not os.path.exists(archivo):
+        return None, registros
+    with open(archivo) as tabla:
+        for linea in tabla:
+            if linea.endswith('\n'): # Una línea sin terminar es un registro interrumpido
+                registros.append(json.loads(linea))
+    if len(registros) == 0:
+        return None, registros
+    return registros[0].get('configuracion'), registros[1:]
+
+def configuracion_barrido(nombres, E_max, L, n, niveles, delta_e, tol_e, metodo):
+    configuracion = {'parametros': nombres, 'E_max': E_max, 'L': L, 'n': n, 'niveles': list(niveles),
+                     'delta_e': delta_e, 'tol_e': tol_e, 'metodo': metodo}
+    return json.loads(json.dumps({clave: valor_tabla(valor) for clave, valor in configuracion.items()})) # Como queda en la tabla
+
+def descartar_incompleto(archivo):
+    if not os.path.exists(archivo):
+        return
+    with open(archivo, 'rb+') as tabla:
+        contenido = tabla.read()
+        if contenido and not contenido.endswith(b'\n'):
+            tabla.truncate(contenido.rfind(b'\n') + 1)
+
+def resolver_punto(V_familia, valores, E_max, L, n, niveles, delta_e, tol_e, metodo):
+    espectro = espectro_Schr(lambda x: V_familia(*valores, x), E_max, L, n, niveles, delta_e, tol_e, metodo = metodo)
+    estados = {}
+    for N in niveles:
+        if N <= len(espectro.niveles):
+            E, x_vec, phi = espectro.estado(N)
+            estados[str(N)] = {'x': x_vec, 'phi': [float(i) for i in phi]}
+    return valores, [float(E) for E in espectro.energias()], estados
+
+def barrido_parametros(V_familia, parametros, archivo, E_max, L, n, niveles = (), delta_e = 1e-4, tol_e = 1e-6, metodo = 'barrido', procesos = None):
+    nombres = list(parametros)
+    configuracion = configuracion_barrido(nombres, E_max, L, n, niveles, delta_e, tol_e, metodo)
+    descartar_incompleto(archivo)
+    configuracion_previa, registros = leer_barrido(archivo)
+    nueva = configuracion_previa == None and len(registros) == 0
+    if not nueva and configuracion_previa != configuracion: # No se mezclan dos barridos en una tabla
+        raise ValueError('La tabla ' + archivo + ' es de otro barrido: ' + json.dumps(configuracion_previa) +
+                         ', y se pidió ' + json.dumps(configuracion))
+    terminados = set([tuple(registro['parametros'][nombre] for nombre in nombres) for registro in registros])
+    pendientes = [valores for valores in malla_parametros(parametros) if valores not in terminados]
+    pool = ProcessPoolExecutor(procesos)
+    try:
+        with open(archivo, 'a') as tabla:
+            if nueva:
+                tabla.write(json.dumps({'configuracion': configuracion}) + '\n')
+                tabla.flush()
+            tareas = [pool.submit(resolver_punto, V_familia, valores, E_max, L, n, tuple(niveles), delta_e, tol_e, metodo)
+                      for valores in pendientes]
+            for tarea in as_completed(tareas):
+                valores, energias, estados = tarea.result()
+                registro = {'parametros': dict(zip(nombres, valores)), 'energias': energias}
+                if estados:
+                    registro['estados'] = estados
+                tabla.write(json.dumps(registro) + '\n')
+                tabla.flush()
+    finally:
+        pool.shutdown(cancel_futures = True) # Al interrumpir no se esperan los puntos pendientes
+    return len(pendientes)
+
+
 # ## Adimensionalización  
 # 
 # Para fines de la solución numérica, conviene definir las [unidades atomicas de Rydberg](http://home.agh.edu.pl/~bjs/ARU.pdf). El uso de estas unidades permite hacer comparables los ordenes de maginitud tan dispares que poseen las variables involucradas y así controlar el error numérico que pueda tener el algoritmo.
 # 
 # Para fines de ilustración se considera que el problema se resuelve solo para electrones, de manera que el problema se hace independiente de la masa, y esta en unidades de Rydberg's se reemplaza el valor adimensional $m_e = 1/2$.
+
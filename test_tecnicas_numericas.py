@@ -0,0 +1,194 @@
+# coding: utf-8
+
+# ### Pruebas de `tecnicas_numericas`
+#
+# Se ejecutan con `python -m pytest -q` desde la carpeta del repositorio.
+
+import pytest
+
+from tecnicas_numericas import *
+from rendimiento import residuos_nucleo
+
+
+# ### Búsqueda sobre el potencial muestreado
+
+def test_E_N_muestra(): # Sin propagador, E_N usa numerov_vec para una muestra
+    potencial = PotencialMuestreado(lambda x: x**2 / 4, 20, 300)
+    E = E_N(potencial.V_rel, 6, 20, 1, 300, usar_cache = False)
+    assert E != None and abs(E - E_N(potencial.V_rel, 6, 20, 1, 300, metodo = 'barrido', usar_cache = False)) < 1e-5
+
+def test_barrido_menor_que_paso():
+    potencial = PotencialMuestreado(lambda x: x**2 / 4, 20, 300)
+    E_vec, residuos, intervalos = barrido(potencial.V_rel, 20, 0.1, 0.10005, 300)
+    assert len(E_vec) == 1 and intervalos == []
+
+
+def test_nodos_una_raiz_por_nivel(): # Pozo doble con pares casi degenerados, un cambio de signo por par
+    potencial = PotencialMuestreado(lambda x: (x**2 - 9)**2 / 4, 12, 400)
+    niveles = [E_N(potencial.V_rel, 12, 12, N, 400, metodo = 'nodos', usar_cache = False, refinar = brent) for N in range(1, 5)]
+    encontrados = [E for E in niveles if E != None]
+    assert len(encontrados) == 2
+    assert abs(encontrados[1] - encontrados[0]) > 1
+
+
+def test_adaptativo_advierte_pares(): # El conteo ve cuatro niveles y el residuo solo separa dos
+    potencial = PotencialMuestreado(lambda x: (x**2 - 9)**2 / 4, 12, 400)
+    with pytest.warns(RuntimeWarning):
+        niveles = list(niveles_Schr(potencial, 12, 12, 400, [], metodo = 'adaptativo'))
+    assert len(niveles) == 2
+    with pytest.warns(RuntimeWarning):
+        assert E_N(potencial.V_rel, 12, 12, 3, 400, metodo = 'adaptativo', usar_cache = False, refinar = brent) == None
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+def test_adaptativo_sin_advertencia():
+    potencial = PotencialMuestreado(lambda x: x**2 / 4, 20, 300)
+    assert len(list(niveles_Schr(potencial, 6.5, 20, 300, [], metodo = 'adaptativo'))) == 7
+
+
+def test_paralelo_reutiliza_procesos():
+    import tecnicas_numericas
+    potencial = PotencialMuestreado(lambda x: x**2 / 4, 20, 300)
+    try:
+        E = [E_N(potencial.V_rel, 4, 20, N, 300, metodo = 'paralelo', usar_cache = False, refinar = brent) for N in (1, 2)]
+        busqueda = tecnicas_numericas.busqueda_activa
+        assert E_N(potencial.V_rel, 4, 20, 3, 300, metodo = 'paralelo', usar_cache = False, refinar = brent) != None
+        assert tecnicas_numericas.busqueda_activa is busqueda # El mismo conjunto de procesos para la misma muestra
+        for N in (1, 2):
+            assert abs(E[N - 1] - E_N(potencial.V_rel, 4, 20, N, 300, metodo = 'barrido', usar_cache = False, refinar = brent)) < 1e-9
+    finally:
+        cerrar_paralelo()
+
+
+# ### Potenciales ingresados como texto
+
+@pytest.mark.parametrize('texto', ['9**9**9**9', '10**10**8', 'sin(x, x)', 'sqrt()', 'sin(x = x)', 'sin + x', '1 % 0', '__import__("os")', 'x.real'])
+def test_potencial_rechazado(texto): # Sin ejecutar código, sin colgarse y sin escribir sobre la malla
+    with pytest.raises((SyntaxError, ValueError)):
+        compilar_potencial(texto)
+
+def test_potencial_malla_intacta():
+    malla = MallaMapeada(compilar_potencial('sin(x) + 2**10 * x**2'), 10, 50, 0.0, 3.0)
+    assert malla.x[0] == -5 and np.all(np.diff(malla.x) > 0)
+    assert abs(malla.V[0] - (sin(-5) + 1024 * 25)) < 1e-9
+
+
+# ### Mallas mapeadas
+#
+# Oscilador $V = x^2$ (autovalores $2N - 1$) en el intervalo más amplio de los controles, con todo el rango de $n$.
+
+@pytest.mark.parametrize('L', [30, 60, 100])
+@pytest.mark.parametrize('n', [100, 200, 300, 400, 500])
+def test_mapeada_oscilador(L, n):
+    potencial = PotencialMuestreado(lambda x: x**2, L, n)
+    for N in range(1, 7):
+        solucion = resolver_potencial(potencial, 12, N, 'mapeada', delta_e = 1e-3)
+        assert solucion != None
+        assert abs(solucion[0] - (2 * N - 1)) < 1e-2
+
+def test_mapeada_frontera_permitida(): # La frontera izquierda queda en la región permitida de los niveles altos
+    Vx = lambda x: x**2 / 4 + 0.02 * x**3
+    referencia = PotencialMuestreado(Vx, 10, 4000)
+    E_ref = espectro_tridiagonal(referencia.V_rel, 8 - referencia.V_min, 10, 4000)[0] + referencia.V_min
+    potencial = PotencialMuestreado(Vx, 10, 200)
+    for N in range(1, len(E_ref) + 1):
+        solucion = resolver_potencial(potencial, 8, N, 'mapeada', tol_e = 1e-9)
+        assert solucion != None
+        assert abs(solucion[0] - E_ref[N - 1]) < 1e-3
+
+
+# ### Potenciales simétricos
+
+def test_paridad_opcional(): # El barrido no cambia de residuo con una muestra simétrica
+    potencial = PotencialMuestreado(lambda x: x**2 / 4, 30, 300)
+    assert potencial.simetrico()
+    assert abs(resolver_potencial(potencial, 6, 1)[0] - 0.4863) < 1e-4
+    assert abs(resolver_potencial(potencial, 6, 1, 'paridad')[0] - 0.5) < 1e-4
+
+def test_paridad_pozo_doble(): # Pares casi degenerados, un nivel en cada sector
+    Vx = lambda x: (x**2 - 9)**2 / 4
+    niveles = espectro_paridad(Vx, 12, 12, 400)
+    assert [paridad for E, paridad in niveles] == [0, 1, 0, 1]
+    potencial = PotencialMuestreado(Vx, 12, 400)
+    for N, (E, paridad) in enumerate(niveles, 1):
+        conteo = intervalo_nodos(potencial.V_rel, 12, 1e-6, 12, N, 400, 1e-9)
+        assert abs(E - conteo[0]) < 1e-6
+        assert abs(resolver_potencial(potencial, 12, N, 'paridad')[0] - E) < 1e-9
+
+def test_paridad_polo_impar(): # phi_(k+1) = 0 en el centro, con V = x^2, L = 100 y n = 100
+    potencial = PotencialMuestreado(lambda x: x**2, 100, 100)
+    for N in range(1, 5):
+        assert resolver_potencial(potencial, 12, N, 'paridad') != None
+
+
+# ### Núcleos de la propagación
+#
+# Cada núcleo disponible debe dar los mismos residuos que `python`, en el barrido por lotes y en la propagación de una energía (`residuos_nucleo`, como `verificar_nucleos` en `rendimiento`).
+
+casos_nucleos = [(lambda x: x**2 / 4, 20, 300, 6), (lambda x: 0 if abs(x) < 2.6 else 10, 30, 300, 10), (lambda x: x**2 / 4 + 0.02 * x**3, 10, 201, 8)]
+
+@pytest.mark.parametrize('nombre', list(nucleos_numerov))
+@pytest.mark.parametrize('Vx, L, n, E_max', casos_nucleos)
+def test_nucleos_equivalentes(nombre, Vx, L, n, E_max):
+    if nombre == 'numba':
+        pytest.importorskip('numba')
+    if nombre not in nucleos_disponibles():
+        pytest.skip('núcleo ' + nombre + ' no disponible')
+    potencial = PotencialMuestreado(Vx, L, n)
+    E_vec = np.linspace(0, E_max - potencial.V_min, 201)[1:]
+    for r, r_ref in zip(residuos_nucleo(nombre, potencial.V_rel, L, E_vec, n), residuos_nucleo('python', potencial.V_rel, L, E_vec, n)):
+        assert np.all(np.isnan(r) == np.isnan(r_ref))
+        assert np.nanmax(np.abs(r - r_ref) / np.maximum(1, np.abs(r_ref))) <= 1e-9
+
+
+# ### Cache de autoestados
+
+def test_cache_hilos(): # Varios hilos guardan y descartan a la vez, como los controles con SolucionFondo
+    from concurrent.futures import ThreadPoolExecutor
+    cache = CacheAutoestados(max_entradas = 8, max_bytes = 64 * 1024)
+    def usar(hilo):
+        for i in range(2000):
+            cache.guardar((hilo, i % 16), np.zeros(i % 64))
+            cache.obtener((hilo, (i + 3) % 16))
+            if i % 97 == 0:
+                cache.invalidar((hilo, i % 16))
+    with ThreadPoolExecutor(max_workers = 3) as ejecutor:
+        list(ejecutor.map(usar, range(3)))
+    assert len(cache.entradas) <= 8
+    assert cache.bytes == sum(tamano for valor, tamano in cache.entradas.values())
+
+
+# ### Continuación en los parámetros
+
+@pytest.mark.parametrize('Vx, valores, L, niveles', [
+    (lambda omega, x: omega**2 * x**2 / 4, [1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6], 30, (1, 2, 3)),
+    (lambda c, x: x**2 / 4 + c * x**3, [0.0, 0.005, 0.01, 0.015, 0.02, 0.025, 0.03], 20, (3, 5))])
+def test_continuacion_sin_historia(Vx, valores, L, niveles): # Tras mover el deslizador, lo mismo que una búsqueda nueva
+    for N in niveles:
+        continuacion = Continuacion()
+        for valor in valores:
+            potencial = PotencialMuestreado(lambda x: Vx(valor, x), L, 300)
+            solucion = continuacion.resolver(potencial, 12, N)
+        nueva = Continuacion().resolver(potencial, 12, N)
+        assert (solucion == None) == (nueva == None)
+        if nueva != None:
+            assert abs(solucion[0] - nueva[0]) < 1e-5
+    assert continuacion.continuaciones > 0
+
+def test_continuacion_dos_raices(): # Con omega = 1.6 el barrido cuenta dos raíces para el estado base
+    potencial = PotencialMuestreado(lambda x: 1.6**2 * x**2 / 4, 30, 300)
+    assert abs(Continuacion().resolver(potencial, 12, 3)[0] - 3.97) < 1e-3
+
+
+# ### Barridos de parámetros
+
+def V_oscilador(omega, x): # A nivel de módulo, para enviarla a los procesos
+    return omega**2 * x**2 / 4
+
+def test_barrido_parametros_configuracion(tmp_path):
+    archivo = str(tmp_path / 'osciladores.jsonl')
+    assert barrido_parametros(V_oscilador, {'omega': [1.0, 1.5]}, archivo, 3, 20, 200, procesos = 2) == 2
+    assert barrido_parametros(V_oscilador, {'omega': [1.0, 1.5, 2.0]}, archivo, 3, 20, 200, procesos = 2) == 1
+    with pytest.raises(ValueError):
+        barrido_parametros(V_oscilador, {'omega': [1.0, 1.5, 2.0]}, archivo, 3, 20, 300, procesos = 2)
+    configuracion, registros = leer_barrido(archivo)
+    assert configuracion['n'] == 200 and len(registros) == 3
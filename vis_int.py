@@ -17,7 +17,7 @@
 # 
 # El motivo de tener pocos requerimientos de funciones matemáticas es por el uso de métodos numéricos y no de herramientas análiticas. La idea es mostrar como con esta metodología es posible analizar un conjunto mayor de problemas sin tener que profundizar en una gran cantidad de herramientas matemáticas y así no limitar la discusión de estos temas a conocimientos avanzados de matemáticas, y más bien depender de un conocimiento básico tanto de matemáticas como de programación para el desarrollo de los problemas, y permitir simplemente la interacción en caso de solo usar estos notebooks como un recurso para el estudio conceptual. Por este último fin, se busca que el notebook conceptual posea el mínimo de código, y este se lleve sobre los notebooks de técnicas numéricas y de visualización.  
 
-# In[23]:
+# In[1]:
 
 from math import sin, cos, tan, sqrt, log, exp, pi
 
@@ -34,7 +34,7 @@ from math import sin, cos, tan, sqrt, log, exp, pi
 # 
 # Dentro de la definición de los controles gráficos (_widgets_) incorporados en __Jupyter__ en el modulo `ipywidgets`, encontramos los siguientes:  
 
-# In[24]:
+# In[2]:
 
 #import ipywidgets
 #dir(ipywidgets)
@@ -47,22 +47,23 @@ from math import sin, cos, tan, sqrt, log, exp, pi
 # * Botones: Elementos que permiten ejecutar una acción al presionarlos, `Button`.  
 # * Texto: Permiten el ingreso de texto arbitrario y asociar la ejecución de una acción a su ingreso. `Text`.  
 # * Contenedores: Permiten agrupar en un solo objeto/vista varios controles. Uno de ellos es `Box`.  
+# * Progreso y salida: `FloatProgress` muestra el avance de un cálculo largo, y `Output` recibe lo que se muestra desde un cálculo en segundo plano.  
 
-# In[25]:
+# In[3]:
 
-from ipywidgets import interact, interactive, fixed, IntSlider, FloatSlider, Button, Text, Box
+from ipywidgets import interact, interactive, fixed, IntSlider, FloatSlider, Button, Text, Box, HBox, VBox, FloatProgress, Output
 
 
 # Entre estos controles que se usan, a veces es necesario crear dependencias de sus rangos respecto al rango o propiedad de otro control. Para este fin usamos la función `link` del modulo `traitlets`. En este modulo se encuentran otras funciones utiles para manipulación de los controles gráficos.
 
-# In[26]:
+# In[4]:
 
 from traitlets import link
 
 
 # Tambien es necesario el uso de elementos que permitan el formato del documento y visualización de elementos y texto enriquecido, fuera de lo posible con texto plano a punta de `print` o con las capacidades de [_MarkDown_](https://daringfireball.net/projects/markdown/) ([Nativo](http://jupyter-notebook.readthedocs.org/en/latest/examples/Notebook/rstversions/Working%20With%20Markdown%20Cells.html) o con [extensión](https://github.com/ipython-contrib/IPython-notebook-extensions/wiki/python-markdown)). Para esto se puede extender el uso métodos para renderizado HTML y LaTeX.  
 
-# In[27]:
+# In[5]:
 
 from IPython.display import clear_output, display, HTML, Latex, Markdown, Math
 
@@ -77,10 +78,15 @@ from IPython.display import clear_output, display, HTML, Latex, Markdown, Math
 # 
 # Para este caso, sin profundidad en la interacción web, se usara Matplotlib.
 
-# In[28]:
+# In[6]:
 
-get_ipython().magic('matplotlib inline')
+try:
+    get_ipython().magic('matplotlib inline')
+except NameError: # Fuera de IPython (python sin interfaz) se usa el backend por defecto
+    pass
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.patches import Polygon
 
 
 # Para indicar la graficación no interactiva embebida en el documento usamos la sguiente linea
@@ -103,7 +109,7 @@ import matplotlib.pyplot as plt
 # 
 # El proceso de interpolación mencionado se realiza por el paquete de graficación y nosotros solo debemos indicar los puntos que pertenecen a la función.  
 
-# In[29]:
+# In[7]:
 
 def discretizar(funcion, a, b, n):
     dx = (b-a)/n
@@ -119,7 +125,7 @@ def graficar_punto_texto(x, f, texto):
     plt.text(x+.2, f+.2, texto)
 
 
-# In[30]:
+# In[8]:
 
 #def int_raiz_sin(a:(-5.,0., .2), b:(0., 5., .2), k:(0.2, 10., .1), n:(1, 100, 1), N:(0, 10, 1)):
 #    f = lambda x: sin(k*x)
@@ -140,7 +146,7 @@ def graficar_punto_texto(x, f, texto):
 # 
 # El ejemplo anterior se puede construir usando `FloatSlider`, `IntSlider`, `Button`, `Text`, `Box` y `display`.  
 
-# In[38]:
+# In[9]:
 
 #def raiz_sin(a, b, k, n, N, texto):
 #    f = lambda x: sin(k*x)
@@ -172,16 +178,20 @@ def graficar_punto_texto(x, f, texto):
 # 
 # La función de graficación del potencial recibe dos listas/arreglos, uno con la información espacial y otro con la evaluación del potencial en dichos puntos. Antes de proceder con el llenado de la representación de la barrera del potencial, se crean los puntos inicial y final con el fin de crear formas cerradas distinguibles para el comando `fill`.
 
-# In[32]:
+# In[10]:
 
 def graficar_potencial(x, V_x):
     V_min = min(V_x)
     plt.fill_between(x, V_min, V_x, facecolor = 'peru')
 
+def contorno_potencial(x, V_x): # El mismo contorno cerrado de fill_between
+    V_min = min(V_x)
+    return [(x[0], V_min)] + list(zip(x, V_x)) + [(x[-1], V_min)]
+
 
 # A continuación se presenta un ejemplo interactivo de graficación del potencial finito. Se inicia con la definición del potencial, la cual se usa para generar un arreglo con la información de la evaluación del potencial en distintos puntos del espacio.
 
-# In[33]:
+# In[11]:
 
 def potencial(V_0, a, x):
     if abs(x) > a/2:
@@ -210,13 +220,13 @@ def potencial(V_0, a, x):
 # 
 # Los estados no ligados son equivalentes a tener particulas libres.  
 
-# In[34]:
+# In[12]:
 
 def graficar_autovalor(L, E):
     plt.plot([-L/2, L/2], [E, E], '--')
 
 
-# In[35]:
+# In[13]:
 
 #def int_potencial_energia(V_0:(.1, 10., .1), E:(.1, 10., .1), a:(.1, 5, .1), L:(1., 10., .5), N:(10, 200, 10)):
 #    dx = L / N
@@ -242,16 +252,71 @@ def graficar_autovalor(L, E):
 
 # La graficación de las autofunciones es mediante el comando `plot` tradicional, y solo tiene de elemento adicional su reescalamiento con base al potencial máximo en la región de interes.
 
-# In[36]:
+# In[14]:
 
 def graficar_autofuncion(x, psi_x, V_max):
+    plt.plot(x, escalar_autofuncion(psi_x, V_max), '-')
+
+def escalar_autofuncion(psi_x, V_max):
     psi_max = max([abs(i) for i in psi_x])
     escala = V_max / psi_max
-    psi_x = [i*escala for i in psi_x]
-    plt.plot(x, psi_x, '-')
+    return [i*escala for i in psi_x]
 
 
-# In[37]:
+# ### Vista persistente
+# 
+# Cada llamado a las funciones de graficación agrega nuevos elementos a la figura actual de pyplot, de manera que una interacción que grafica tras cada cambio de parámetros crea una figura completa cada vez. La clase `VistaSolucion` crea una sola vez la figura y sus elementos (el relleno del potencial, la línea de la autofunción, la del autovalor y una línea para `graficar_funcion`), y en cada solución solo actualiza sus datos. Por defecto la figura no pertenece a pyplot (no se muestra sola al terminar la celda ni se acumula en su registro), y se muestra con `display(vista.figura)`; también se le puede pasar una figura de un backend interactivo (por ejemplo `plt.figure()` con `%matplotlib widget`), que `dibujar` actualiza en su lugar. Con `blit = True`, en los backends que lo soportan, solo se redibujan los elementos que cambian sobre un fondo guardado, mientras los límites de los ejes no cambien.
+
+# In[15]:
+
+class VistaSolucion:
+    def __init__(self, figura = None, blit = False):
+        self.figura = figura if figura != None else Figure()
+        self.ejes = self.figura.gca()
+        self.relleno = Polygon([(0, 0)], closed = True, facecolor = 'peru', visible = False)
+        self.ejes.add_patch(self.relleno)
+        self.onda, = self.ejes.plot([], [], '-')
+        self.nivel, = self.ejes.plot([], [], '--')
+        self.curva, = self.ejes.plot([], [], '-')
+        self.artistas = [self.relleno, self.onda, self.nivel, self.curva]
+        self.blit = blit and getattr(self.figura.canvas, 'supports_blit', False)
+        self.fondo = None
+        self.limites = None
+        for artista in self.artistas:
+            artista.set_animated(self.blit)
+
+    def potencial(self, x, V_x):
+        self.relleno.set_xy(contorno_potencial(x, V_x))
+        self.relleno.set_visible(True)
+
+    def autofuncion(self, x, psi_x, V_max):
+        self.onda.set_data(x, escalar_autofuncion(psi_x, V_max))
+
+    def autovalor(self, L, E):
+        self.nivel.set_data([-L/2, L/2], [E, E])
+
+    def funcion(self, x, f):
+        self.curva.set_data(x, f)
+
+    def dibujar(self):
+        self.ejes.relim(visible_only = True)
+        self.ejes.autoscale_view()
+        lienzo = self.figura.canvas
+        if not self.blit:
+            lienzo.draw_idle()
+            return
+        limites = (self.ejes.get_xlim(), self.ejes.get_ylim())
+        if self.fondo == None or limites != self.limites: # Con nuevos límites se redibuja y se guarda el fondo
+            lienzo.draw()
+            self.fondo = lienzo.copy_from_bbox(self.figura.bbox)
+            self.limites = limites
+        lienzo.restore_region(self.fondo)
+        for artista in self.artistas:
+            self.ejes.draw_artist(artista)
+        lienzo.blit(self.figura.bbox)
+
+
+# In[16]:
 
 #def onda(V_0, E, a, x):
 #    if abs(x) <= a/2:
@@ -279,3 +344,4 @@ def graficar_autofuncion(x, psi_x, V_max):
 #    
 #interact(int_potencial_auto_ef)
 
+